@@ -0,0 +1,222 @@
+"""
+Benchmarks for the screen capture and image detection paths
+Run with: python benchmark.py <name> [--seconds N]
+"""
+
+import argparse
+import time
+import tracemalloc
+import cv2
+import mss
+import numpy as np
+from image_utils import ScreenCapture, match_template, TILE_WORKERS
+from input_backend import BACKENDS
+
+
+def _rate(func, seconds: float) -> float:
+    """
+    Call a function repeatedly for a fixed time
+
+    Args:
+        func: Zero-argument callable to measure
+        seconds: How long to keep calling it
+
+    Returns:
+        Calls per second
+    """
+    func()  # Warm up (first call may open connections or allocate)
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        func()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def _allocated(func, calls: int = 20) -> float:
+    """
+    Measure how much memory a call allocates
+    
+    Args:
+        func: Zero-argument callable to measure
+        calls: Number of measured calls
+    
+    Returns:
+        Average peak bytes allocated (via tracemalloc) per call
+    """
+    tracemalloc.start()
+    try:
+        func()  # Warm up
+        total = 0
+        for _ in range(calls):
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            func()
+            total += tracemalloc.get_traced_memory()[1] - current
+    finally:
+        tracemalloc.stop()
+    return total / calls
+
+
+def _synthetic_screen(width: int = 3840, height: int = 2160, seed: int = 0) -> np.ndarray:
+    """
+    Build a repeatable screen-like BGR image (smooth blobs, so matching isn't trivial)
+
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+        seed: Random seed
+
+    Returns:
+        BGR numpy array
+    """
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, (height // 8, width // 8, 3), dtype=np.uint8)
+    return cv2.resize(noise, (width, height), interpolation=cv2.INTER_LINEAR)
+
+
+def bench_grab(seconds: float):
+    """Compare opening mss per capture against the persistent per-thread grabber"""
+    def grab_reconnect():
+        with mss.mss() as sct:
+            sct.grab(sct.monitors[1])
+
+    capture = ScreenCapture()
+
+    before = _rate(grab_reconnect, seconds)
+    after = _rate(capture.grab_raw, seconds)
+
+    monitor = capture.monitor()
+    print(f"Monitor: {monitor['width']}x{monitor['height']}")
+    print(f"  with mss.mss() per grab: {before:8.1f} grabs/sec")
+    print(f"  persistent grabber:      {after:8.1f} grabs/sec  ({after / before:.2f}x)")
+
+
+def bench_pyramid(seconds: float):
+    """Compare exact and coarse-to-fine (pyramid) matching on a synthetic 4K frame"""
+    screen = _synthetic_screen()
+    print(f"Frame: {screen.shape[1]}x{screen.shape[0]}")
+
+    for x, y, w, h in [(1234, 777, 200, 120), (3000, 100, 64, 40), (500, 1800, 32, 32)]:
+        template = screen[y:y + h, x:x + w].copy()
+        exact = match_template(screen, template, 0.8, "exact")
+        pyramid = match_template(screen, template, 0.8, "pyramid")
+        exact_rate = _rate(lambda: match_template(screen, template, 0.8, "exact"), seconds)
+        pyramid_rate = _rate(lambda: match_template(screen, template, 0.8, "pyramid"), seconds)
+        same = "same" if exact[1] == pyramid[1] else "DIFFERENT"
+        print(f"  template {w}x{h}: exact {1000 / exact_rate:7.1f} ms, "
+              f"pyramid {1000 / pyramid_rate:7.1f} ms ({pyramid_rate / exact_rate:.1f}x), "
+              f"location {same} (score {exact[0]:.3f} vs {pyramid[0]:.3f})")
+
+
+def bench_tiled(seconds: float):
+    """Compare single-call and tiled multi-core matching on a synthetic 4K frame"""
+    screen = _synthetic_screen()
+    print(f"Frame: {screen.shape[1]}x{screen.shape[0]}, {TILE_WORKERS} worker thread(s)")
+
+    for x, y, w, h in [(1234, 777, 200, 120), (3000, 2000, 64, 40)]:
+        template = screen[y:y + h, x:x + w].copy()
+        exact = match_template(screen, template, 0.8, "exact")
+        tiled = match_template(screen, template, 0.8, "tiled")
+        exact_rate = _rate(lambda: match_template(screen, template, 0.8, "exact"), seconds)
+        tiled_rate = _rate(lambda: match_template(screen, template, 0.8, "tiled"), seconds)
+        # A threshold above 1.0 can never be reached, so this measures the no-early-exit case
+        miss_rate = _rate(lambda: match_template(screen, template, 1.01, "tiled"), seconds)
+        same = "same" if exact[1] == tiled[1] else "DIFFERENT"
+        print(f"  template {w}x{h}: exact {1000 / exact_rate:7.1f} ms, "
+              f"tiled {1000 / tiled_rate:7.1f} ms ({tiled_rate / exact_rate:.1f}x), "
+              f"tiled without early exit {1000 / miss_rate:7.1f} ms, location {same}")
+
+
+def bench_alloc(seconds: float):
+    """Compare copy-then-convert captures against zero-copy views into reused buffers"""
+    screen = cv2.cvtColor(_synthetic_screen(), cv2.COLOR_BGR2BGRA)
+    height, width = screen.shape[:2]
+    raw = bytearray(screen.tobytes())  # Stand-in for the mss grab buffer
+    buffer = np.empty((height, width, 3), dtype=np.uint8)
+
+    def copy_convert():
+        # The old capture path: np.array(screenshot) copy, then a new BGR array
+        img = np.array(np.frombuffer(raw, dtype=np.uint8).reshape(height, width, 4))
+        return cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+
+    def view_convert():
+        bgra = np.frombuffer(raw, dtype=np.uint8).reshape(height, width, 4)
+        return cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=buffer)
+
+    print(f"Frame: {width}x{height} (synthetic BGRA buffer)")
+    for label, func in [("copy + convert", copy_convert), ("view + reused buffer", view_convert)]:
+        print(f"  {label:21s} {_allocated(func) / 2**20:7.1f} MB allocated/frame, "
+              f"{1000 / _rate(func, seconds):6.1f} ms/frame")
+
+    try:
+        capture = ScreenCapture()
+        capture.grab()
+    except Exception as e:
+        print(f"  (no screen to capture from, skipping live captures: {e})")
+        return
+    monitor = capture.monitor()
+    live = np.empty((monitor["height"], monitor["width"], 3), dtype=np.uint8)
+    print(f"Monitor: {monitor['width']}x{monitor['height']} (live captures, including mss's own grab buffer)")
+    for label, func in [("grab", capture.grab), ("grab into buffer", lambda: capture.grab(dst=live))]:
+        print(f"  {label:21s} {_allocated(func) / 2**20:7.1f} MB allocated/frame, "
+              f"{1000 / _rate(func, seconds):6.1f} ms/frame")
+
+
+def bench_input(seconds: float):
+    """Measure mouse actions/sec of each input backend (moves the mouse back and forth, no clicks)"""
+    results = {}
+    for name, backend_class in BACKENDS.items():
+        try:
+            backend = backend_class()
+        except Exception as e:
+            print(f"  {name:10s} unavailable: {e}")
+            continue
+        try:
+            positions = [(100, 100), (140, 100)]
+            state = {"i": 0}
+
+            def move():
+                state["i"] ^= 1
+                backend.move(*positions[state["i"]])
+
+            results[name] = _rate(move, seconds)
+            print(f"  {name:10s} {results[name]:9.0f} actions/sec")
+        finally:
+            backend.close()
+
+    if "pyautogui" in results:
+        # For comparison: pyautogui with its default PAUSE, as image_utils.click_at uses it
+        import pyautogui
+        rate = _rate(lambda: pyautogui.moveTo(100, 100), min(seconds, 1.0))
+        print(f"  {'pyautogui with default PAUSE':28s} {rate:9.1f} actions/sec")
+
+
+BENCHMARKS = {
+    "alloc": bench_alloc,
+    "grab": bench_grab,
+    "input": bench_input,
+    "pyramid": bench_pyramid,
+    "tiled": bench_tiled,
+}
+
+
+def main():
+    """Entry point for the benchmarks"""
+    parser = argparse.ArgumentParser(description="Simple Macro benchmarks")
+    parser.add_argument("names", nargs="*", help=f"Benchmarks to run: {', '.join(sorted(BENCHMARKS))} (default: all)")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Time spent on each measurement")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    for name in args.names or sorted(BENCHMARKS):
+        print(f"=== {name} ===")
+        BENCHMARKS[name](args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,13 +10,15 @@ class CustomRobloxMacro(RobloxMacro):
         """
         Custom macro logic implementation
         Override this method to define your own behavior
+        (simple "if X is on screen, click it / press a key" checks can instead
+        be listed as rules in config.json, see RuleEngine in macro.py)
         """
         
         # Example 1: Auto-clicker for a specific button
         if self.image_exists("target_button"):
             print("Found target button, clicking...")
             self.find_and_click("target_button")
-            time.sleep(0.5)
+            self.sleep(0.5)
         
         # Example 2: Resource collection pattern
         # Look for multiple types of collectibles
@@ -24,7 +26,7 @@ class CustomRobloxMacro(RobloxMacro):
             if self.image_exists(collectible):
                 print(f"Found {collectible}, collecting...")
                 self.find_and_click(collectible)
-                time.sleep(0.3)
+                self.sleep(0.3)
         
         # Example 3: Navigation pattern
         # Click through a sequence of buttons
@@ -33,7 +35,7 @@ class CustomRobloxMacro(RobloxMacro):
             if self.image_exists(button):
                 print(f"Clicking {button}...")
                 self.find_and_click(button)
-                time.sleep(1)
+                self.sleep(1)
                 break  # Exit after first match
         
         # Example 4: Handle popups
@@ -42,7 +44,7 @@ class CustomRobloxMacro(RobloxMacro):
             if self.image_exists(button):
                 print(f"Closing popup with {button}...")
                 self.find_and_click(button)
-                time.sleep(0.5)
+                self.sleep(0.5)
                 break
         
         # Example 5: Conditional actions based on game state
@@ -50,28 +52,31 @@ class CustomRobloxMacro(RobloxMacro):
             print("Low health detected, using health pack...")
             if self.image_exists("health_pack"):
                 self.find_and_click("health_pack")
-                time.sleep(1)
+                self.sleep(1)
         
         # Example 6: Combat macro
         if self.image_exists("enemy"):
             print("Enemy detected, attacking...")
+            self.check_halted()  # Don't attack once paused or stopped
             keyboard.press("space")  # Attack key
-            time.sleep(0.2)
+            time.sleep(0.2)  # Key hold; must be released even if stopped
             keyboard.release("space")
+            # The attack changes the screen; later checks need a fresh capture
+            self.frame.invalidate()
         
         # Example 7: Farming macro
         if self.image_exists("crop_ready"):
             print("Crop ready, harvesting...")
             self.find_and_click("crop_ready")
-            time.sleep(0.5)
+            self.sleep(0.5)
             
             # Replant
             if self.image_exists("plant_button"):
                 self.find_and_click("plant_button")
-                time.sleep(0.5)
+                self.sleep(0.5)
         
         # Add a small delay between checks
-        time.sleep(0.1)
+        self.sleep(0.1)
 
 
 def main():
@@ -1,23 +1,1415 @@
+import os
+import math
+import time
+import threading
+import weakref
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 import cv2
 import numpy as np
 import mss
 from PIL import Image
-import pyautogui
-from typing import Tuple, Optional, List
+from typing import Tuple, Optional, List, Dict, Hashable
+
+
+# Color modes for matching: "color" matches all three BGR channels, "gray" a
+# grayscale conversion (about 3x cheaper), and "blue"/"green"/"red" a single channel
+COLOR_MODES = ("color", "gray", "blue", "green", "red")
+_CHANNELS = {"blue": 0, "green": 1, "red": 2}
+
+
+def convert_color(image: np.ndarray, color_mode: str = "color") -> np.ndarray:
+    """
+    Convert a BGR image to the channel layout used by a color mode
+    
+    Args:
+        image: BGR image; single-channel images are returned unchanged
+        color_mode: One of COLOR_MODES
+    
+    Returns:
+        The image itself for "color", otherwise a single-channel image
+    """
+    if color_mode not in COLOR_MODES:
+        raise ValueError(f"Unknown color mode: {color_mode}")
+    if color_mode == "color" or image.ndim == 2:
+        return image
+    if color_mode == "gray":
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return cv2.extractChannel(image, _CHANNELS[color_mode])
+
+
+def _split_alpha(image: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Split an image read with IMREAD_UNCHANGED into 8-bit BGR pixels and a match mask
+    
+    Args:
+        image: Decoded image (gray, BGR or BGRA; 8 or 16 bit)
+    
+    Returns:
+        Tuple of (BGR image, mask) where mask is 255 for opaque pixels (alpha >= 128)
+        and 0 for transparent ones, or None if the image has no usable transparency
+    """
+    if image.dtype != np.uint8:
+        # Same 16-bit to 8-bit scaling cv2.imread applies by default
+        image = cv2.convertScaleAbs(image, alpha=1 / 256)
+    if image.ndim == 2:
+        return (cv2.cvtColor(image, cv2.COLOR_GRAY2BGR), None)
+    if image.shape[2] != 4:
+        return (image, None)
+    
+    mask = np.where(image[:, :, 3] >= 128, 255, 0).astype(np.uint8)
+    bgr = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+    if mask.all() or not mask.any():
+        # Fully opaque (or fully transparent) images match better without a mask
+        return (bgr, None)
+    return (bgr, mask)
+
+
+class TemplateCache:
+    """Process-wide LRU cache of decoded template images"""
+    
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, max_entries: int = 512):
+        """
+        Initialize the template cache
+        
+        Args:
+            max_bytes: Memory cap for all cached pixel data
+            max_entries: Maximum number of templates kept at once
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # path -> ((mtime_ns, size), {color_mode: image, "mask": alpha mask if the file has one})
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+    
+    def get(self, template_path, color_mode: str = "color") -> Optional[np.ndarray]:
+        """
+        Return the decoded template for a file, decoding it only when needed
+        
+        The file's mtime and size are checked on every call, so a template
+        that is replaced on disk is decoded again on its next use. Each color
+        mode is converted once and cached next to the BGR image.
+        
+        Args:
+            template_path: Path to the template image file
+            color_mode: One of COLOR_MODES
+        
+        Returns:
+            Read-only template image in the color mode's layout, or None if it can't be read
+        """
+        loaded = self.get_masked(template_path, color_mode)
+        return loaded[0] if loaded is not None else None
+    
+    def get_masked(self, template_path,
+                   color_mode: str = "color") -> Optional[Tuple[np.ndarray, Optional[np.ndarray]]]:
+        """
+        Return the decoded template for a file together with its alpha mask
+        
+        The mask is decoded with the template (IMREAD_UNCHANGED) and cached
+        alongside it, so masked searches cost no extra I/O.
+        
+        Args:
+            template_path: Path to the template image file
+            color_mode: One of COLOR_MODES
+        
+        Returns:
+            Tuple of (read-only template, read-only mask or None if the image has no
+            transparency), or None if the file can't be read
+        """
+        if color_mode not in COLOR_MODES:
+            raise ValueError(f"Unknown color mode: {color_mode}")
+        path = os.path.abspath(str(template_path))
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(path)
+                variants = entry[1]
+                if color_mode in variants:
+                    self.hits += 1
+                    return (variants[color_mode], variants.get("mask"))
+                image = variants["color"]
+                mask = variants.get("mask")
+            else:
+                image = None
+        
+        if image is None:
+            # Decode outside the lock so other threads aren't blocked on disk I/O
+            image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+            if image is None:
+                return None
+            image, mask = _split_alpha(image)
+            # Cached arrays are shared between threads, so guard against in-place edits
+            image.setflags(write=False)
+            if mask is not None:
+                mask.setflags(write=False)
+        
+        converted = convert_color(image, color_mode)
+        if converted is not image:
+            converted.setflags(write=False)
+        
+        with self._lock:
+            self.misses += 1
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stamp and entry[1]["color"] is image:
+                # Add the new conversion to the existing entry
+                if color_mode not in entry[1]:
+                    entry[1][color_mode] = converted
+                    self._bytes += converted.nbytes
+            else:
+                old = self._entries.pop(path, None)
+                if old is not None:
+                    self._bytes -= sum(variant.nbytes for variant in old[1].values())
+                variants = {"color": image, color_mode: converted}
+                if mask is not None:
+                    variants["mask"] = mask
+                size = sum(variant.nbytes for variant in variants.values())
+                if size <= self.max_bytes:
+                    self._entries[path] = (stamp, variants)
+                    self._bytes += size
+            self._evict()
+        return (converted, mask)
+    
+    def clear(self):
+        """Drop every cached template"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def stats(self) -> dict:
+        """Return hit/miss counters and current memory usage"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+    
+    def _evict(self):
+        """Evict least recently used entries until within limits (lock must be held)"""
+        while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+            _, (_, variants) = self._entries.popitem(last=False)
+            self._bytes -= sum(variant.nbytes for variant in variants.values())
+
+
+# Shared by the GUI playback, the item detector and RobloxMacro so every
+# template is decoded once per run
+template_cache = TemplateCache()
+
+
+class ScreenCapture:
+    """Keeps one persistent mss grabber per thread and reuses it for every capture"""
+    
+    def __init__(self, monitor_index: int = 1):
+        """
+        Initialize the capture service
+        
+        Args:
+            monitor_index: mss monitor used when no region is given (1 = primary)
+        """
+        self.monitor_index = monitor_index
+        self._local = threading.local()
+        self._monitor = None
+    
+    def _grabber(self):
+        """Return this thread's mss instance, creating it on first use"""
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            # mss handles are not safe to share between threads, so each thread gets its own
+            sct = mss.mss()
+            self._local.sct = sct
+        return sct
+    
+    def monitor(self) -> dict:
+        """
+        Get the geometry of the capture monitor
+        
+        Returns:
+            Dict with 'left', 'top', 'width', 'height' keys (cached after the first call)
+        """
+        if self._monitor is None:
+            monitors = self._grabber().monitors
+            try:
+                monitor = monitors[self.monitor_index]
+            except IndexError:
+                # Some environments may only expose monitors[0]
+                monitor = monitors[0]
+            self._monitor = {
+                "left": monitor["left"],
+                "top": monitor["top"],
+                "width": monitor["width"],
+                "height": monitor["height"]
+            }
+        return self._monitor
+    
+    def refresh_monitor(self):
+        """Forget the cached monitor geometry (e.g. after a resolution change)"""
+        self._monitor = None
+    
+    def grab_raw(self, region: Optional[dict] = None):
+        """
+        Capture the screen without any conversion
+        
+        Args:
+            region: Optional dict with 'top', 'left', 'width', 'height' keys
+                   If None, captures the whole capture monitor
+        
+        Returns:
+            mss ScreenShot object (BGRA)
+        """
+        if region is None:
+            monitor = self.monitor()
+        else:
+            monitor = {
+                "top": region["top"],
+                "left": region["left"],
+                "width": region["width"],
+                "height": region["height"]
+            }
+        return self._grabber().grab(monitor)
+    
+    def grab(self, region: Optional[dict] = None, dst: Optional[np.ndarray] = None,
+             color_mode: str = "color") -> np.ndarray:
+        """
+        Capture the screen or a region as a BGR (or single-channel) image
+        
+        The grab buffer is wrapped without copying and converted straight into
+        the output, so a capture costs one conversion and at most one allocation.
+        
+        Args:
+            region: Optional dict with 'top', 'left', 'width', 'height' keys
+            dst: Optional preallocated output to convert into; ignored (and a new
+                 array allocated) if its shape doesn't fit the capture
+            color_mode: One of COLOR_MODES; single-channel modes are converted
+                        directly from BGRA
+        
+        Returns:
+            Screenshot as numpy array in BGR format (`dst` itself when it was used)
+        """
+        if color_mode not in COLOR_MODES:
+            raise ValueError(f"Unknown color mode: {color_mode}")
+        screenshot = self.grab_raw(region)
+        # View over mss's own buffer (no copy)
+        bgra = np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(screenshot.height, screenshot.width, 4)
+        
+        shape = bgra.shape[:2] + ((3,) if color_mode == "color" else ())
+        if dst is not None and (dst.shape != shape or dst.dtype != np.uint8 or not dst.flags.writeable):
+            dst = None
+        if color_mode == "color":
+            return cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=dst)
+        if color_mode == "gray":
+            return cv2.cvtColor(bgra, cv2.COLOR_BGRA2GRAY, dst=dst)
+        return cv2.extractChannel(bgra, _CHANNELS[color_mode], dst=dst)
+    
+    def grab_pil(self, region: Optional[dict] = None) -> Image.Image:
+        """
+        Capture the screen or a region as an RGB PIL image
+        
+        Args:
+            region: Optional dict with 'top', 'left', 'width', 'height' keys
+        
+        Returns:
+            Screenshot as a PIL Image
+        """
+        screenshot = self.grab_raw(region)
+        return Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
+    
+    def close_thread(self):
+        """
+        Close the calling thread's grabber
+        
+        Every thread that captures opens its own display connection, which stays
+        open until that thread calls this, so call it before a capturing thread
+        exits. A later capture on the same thread opens a new grabber.
+        """
+        sct = getattr(self._local, "sct", None)
+        if sct is not None:
+            sct.close()
+            self._local.sct = None
+    
+    def close(self):
+        """Close the calling thread's grabber (same as close_thread)"""
+        self.close_thread()
+
+
+# Shared capture service; each thread keeps its own display connection open
+screen_capture = ScreenCapture()
+
+
+class BufferPool:
+    """
+    Reusable capture output buffers
+    
+    acquire() leases out a buffer's memory. The memory comes back to the pool
+    only when the leased array and every view, crop or frame made from it have
+    been garbage collected, so pixels somebody still holds are never
+    overwritten; while all pooled memory is in use, new buffers are allocated.
+    """
+    
+    def __init__(self, max_buffers: int = 4):
+        """
+        Args:
+            max_buffers: Number of returned buffers kept for reuse
+        """
+        self.max_buffers = max_buffers
+        self.allocations = 0
+        # Memory of buffers nobody references anymore; deque operations are atomic,
+        # so finalizers (which run wherever the last reference dies) need no lock
+        self._free = deque(maxlen=max_buffers)
+    
+    def acquire(self, shape: Tuple[int, ...]) -> np.ndarray:
+        """
+        Lease a writable uint8 buffer of the given shape
+        
+        Args:
+            shape: Array shape, e.g. (height, width, 3)
+        
+        Returns:
+            An array over returned memory of the right size, or over newly allocated memory
+        """
+        shape = tuple(shape)
+        size = int(np.prod(shape))
+        memory = None
+        for _ in range(len(self._free)):
+            try:
+                candidate = self._free.popleft()
+            except IndexError:
+                break
+            if len(candidate) == size:
+                memory = candidate
+                break
+            self._free.append(candidate)
+        if memory is None:
+            memory = bytearray(size)
+            self.allocations += 1
+        # Every view of the buffer keeps this array alive; the memory returns once it is collected
+        owner = np.frombuffer(memory, dtype=np.uint8)
+        weakref.finalize(owner, self._free.append, memory)
+        return owner.reshape(shape)
+
+
+def bounding_region(regions: List[Optional[dict]]) -> Optional[dict]:
+    """
+    Get the smallest region containing several screen-space regions
+    
+    Args:
+        regions: Dicts with 'left', 'top', 'width', 'height' keys; None (or an
+                 empty dict) stands for the whole monitor
+    
+    Returns:
+        The bounding box, or None if there are no regions or any of them is the whole monitor
+    """
+    if not regions or any(not region for region in regions):
+        return None
+    left = min(region["left"] for region in regions)
+    top = min(region["top"] for region in regions)
+    right = max(region["left"] + region["width"] for region in regions)
+    bottom = max(region["top"] + region["height"] for region in regions)
+    return {"left": left, "top": top, "width": right - left, "height": bottom - top}
+
+
+class Frame:
+    """A captured BGR frame with its capture time and screen position"""
+    
+    def __init__(self, image: np.ndarray, timestamp: float, origin: Tuple[int, int], seq: int,
+                 full_monitor: bool = False):
+        """
+        Args:
+            image: Captured frame in BGR format
+            timestamp: time.monotonic() when the capture started
+            origin: Screen position (left, top) of the frame's top-left pixel
+            seq: Increasing frame number assigned by the FrameBus
+            full_monitor: Whether the frame is a capture of the whole monitor
+                (rather than of some subscribers' search areas)
+        """
+        self.image = image
+        self.timestamp = timestamp
+        self.origin = origin
+        self.seq = seq
+        self.full_monitor = full_monitor
+        self._converted = {"color": image}  # color_mode -> converted frame
+    
+    @property
+    def age(self) -> float:
+        """Seconds since the frame was captured"""
+        return time.monotonic() - self.timestamp
+    
+    def covers(self, region: Optional[dict]) -> bool:
+        """Check whether a screen-space region (None = whole monitor) lies inside this frame"""
+        if not region:
+            return self.full_monitor
+        height, width = self.image.shape[:2]
+        return (region["left"] >= self.origin[0] and region["top"] >= self.origin[1] and
+                region["left"] + region["width"] <= self.origin[0] + width and
+                region["top"] + region["height"] <= self.origin[1] + height)
+    
+    def converted(self, color_mode: str = "color") -> np.ndarray:
+        """
+        Get the frame in a color mode's channel layout
+        
+        The conversion runs once per frame and is shared by every consumer
+        matching in that mode.
+        
+        Args:
+            color_mode: One of COLOR_MODES
+        
+        Returns:
+            Read-only converted frame
+        """
+        image = self._converted.get(color_mode)
+        if image is None:
+            image = convert_color(self.image, color_mode)
+            image.setflags(write=False)
+            # Two threads may race to convert; either result is fine to keep
+            image = self._converted.setdefault(color_mode, image)
+        return image
+    
+    def to_pil(self) -> Image.Image:
+        """Convert the frame to an RGB PIL image"""
+        return Image.fromarray(cv2.cvtColor(self.image, cv2.COLOR_BGR2RGB))
+
+
+class FrameSubscription:
+    """A consumer's handle on the FrameBus"""
+    
+    def __init__(self, bus: "FrameBus", max_age: float, region: Optional[dict]):
+        self.bus = bus
+        self.max_age = max_age
+        # Screen-space area this consumer needs (None = whole monitor); may be changed between gets
+        self.region = region
+        self.closed = False
+    
+    def get(self, timeout: float = 1.0) -> Optional[Frame]:
+        """
+        Get a frame no older than max_age that covers this subscription's region
+        
+        Args:
+            timeout: Maximum time to wait for the capture thread
+        
+        Returns:
+            Frame, or None if no suitable frame arrived in time
+        """
+        return self.bus._get_frame(self, timeout)
+    
+    def close(self):
+        """Stop consuming frames; the capture thread exits when nobody is subscribed"""
+        if not self.closed:
+            self.closed = True
+            self.bus._unsubscribe(self)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class FrameBus:
+    """
+    Single capture thread shared by every screen watcher
+    
+    Consumers subscribe with a maximum staleness ("a frame no older than 50 ms").
+    When a consumer needs a fresher frame than the newest one in the ring buffer it
+    asks the capture thread for one; every consumer asking during the same tick gets
+    that same frame, so the screen is captured at most once per tick no matter how
+    many watchers are active. Each capture covers the bounding box of the regions
+    the current subscribers need.
+    
+    Frame pixels live in pooled buffers (see BufferPool). A buffer is reused only
+    after the frame, its image and every crop of it are gone, so a frame's pixels
+    stay as captured for as long as a consumer holds any part of them.
+    """
+    
+    def __init__(self, capture: Optional[ScreenCapture] = None, tick: float = 0.01, buffer_size: int = 3):
+        """
+        Args:
+            capture: Capture service used by the producer thread
+            tick: Minimum time between two captures in seconds
+            buffer_size: Number of recent frames kept in the ring buffer
+        """
+        self.capture = capture or screen_capture
+        self.tick = tick
+        self.captures = 0
+        self._frames = deque(maxlen=buffer_size)
+        self._buffers = BufferPool(buffer_size + 2)
+        self._subscriptions = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._wanted = False
+        self._seq = 0
+    
+    def subscribe(self, max_age: float = 0.05, region: Optional[dict] = None) -> FrameSubscription:
+        """
+        Register a consumer and make sure the capture thread is running
+        
+        Args:
+            max_age: Oldest acceptable frame age in seconds
+            region: Screen-space area the consumer needs (None = whole monitor)
+        
+        Returns:
+            FrameSubscription (also usable as a context manager)
+        """
+        subscription = FrameSubscription(self, max_age, region)
+        with self._cond:
+            self._subscriptions.append(subscription)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="FrameBus", daemon=True)
+                self._thread.start()
+        return subscription
+    
+    def latest(self) -> Optional[Frame]:
+        """Return the newest frame in the ring buffer, however old"""
+        with self._cond:
+            return self._frames[-1] if self._frames else None
+    
+    def _unsubscribe(self, subscription: FrameSubscription):
+        with self._cond:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+            self._cond.notify_all()
+    
+    def _get_frame(self, subscription: FrameSubscription, timeout: float) -> Optional[Frame]:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not subscription.closed:
+                for frame in reversed(self._frames):
+                    if frame.age > subscription.max_age:
+                        break
+                    if frame.covers(subscription.region):
+                        return frame
+                
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._wanted = True
+                self._cond.notify_all()
+                self._cond.wait(remaining)
+        return None
+    
+    def _capture_area(self) -> Optional[dict]:
+        """Bounding box of every subscriber's region (None if anyone needs the whole monitor)"""
+        return bounding_region([sub.region for sub in self._subscriptions])
+    
+    def _run(self):
+        """Producer loop: capture when a consumer asks, at most once per tick"""
+        last_capture = 0.0
+        while True:
+            with self._cond:
+                while not self._wanted and self._subscriptions:
+                    self._cond.wait()
+                if not self._subscriptions:
+                    self._thread = None
+                    self._frames.clear()
+                    # The next subscriber starts a new thread with its own grabber
+                    self.capture.close_thread()
+                    return
+                self._wanted = False
+                area = self._capture_area()
+            
+            wait = last_capture + self.tick - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            
+            full_monitor = area is None
+            if full_monitor:
+                area = self.capture.monitor()
+            origin = (area["left"], area["top"])
+            
+            last_capture = time.monotonic()
+            try:
+                # Convert into a recycled buffer instead of allocating a new frame every capture
+                buffer = self._buffers.acquire((area["height"], area["width"], 3))
+                image = self.capture.grab(area, dst=buffer)
+            except Exception as e:
+                print(f"Frame capture error: {e}")
+                time.sleep(0.5)
+                continue
+            
+            # Frames are shared by every consumer, so hand out a read-only view
+            image = image.view()
+            image.setflags(write=False)
+            with self._cond:
+                self._seq += 1
+                self.captures += 1
+                self._frames.append(Frame(image, last_capture, origin, self._seq, full_monitor))
+                self._cond.notify_all()
+
+
+# Shared frame bus for playback, the item detector and loop screenshots
+frame_bus = FrameBus()
+
+
+# Template matching modes: "exact" matches the full-resolution frame, "pyramid" finds
+# candidates on a downscaled frame and then refines them at full resolution, "tiled"
+# splits the frame into overlapping tiles matched in parallel on a thread pool
+MATCH_MODES = ("exact", "pyramid", "tiled")
+
+# Pyramid matching only downscales while the template stays at least this many pixels
+PYRAMID_MIN_TEMPLATE_SIZE = 12
+PYRAMID_MAX_DOWNSCALE = 4
+PYRAMID_MAX_CANDIDATES = 5
+# Coarse scores are blurrier than full-resolution ones, so candidates are kept
+# if they come within this margin of the confidence threshold
+PYRAMID_SCORE_SLACK = 0.2
+
+# Thread pool for tiled matching (OpenCV releases the GIL inside matchTemplate)
+TILE_WORKERS = os.cpu_count() or 4
+_tile_pool = None
+_tile_pool_lock = threading.Lock()
+
+
+def _match_scores(image: np.ndarray, template: np.ndarray, mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """TM_CCOEFF_NORMED score map, restricted to the mask's opaque pixels if a mask is given"""
+    if mask is None:
+        return cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+    result = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED, mask=mask)
+    # Flat areas under the mask divide by zero (NaN/inf); treat them as non-matches
+    result[~np.isfinite(result)] = 0.0
+    return result
+
+
+def match_template(screenshot: np.ndarray, template: np.ndarray, threshold: float,
+                   mode: str = "exact", mask: Optional[np.ndarray] = None) -> Tuple[float, Tuple[int, int]]:
+    """
+    Find the best TM_CCOEFF_NORMED match of a template in a screenshot
+    
+    Args:
+        screenshot: Image to search (BGR numpy array)
+        template: Template to search for, same channel layout as the screenshot
+        threshold: Confidence the caller will accept; pyramid mode uses it to pick candidates
+        mode: One of MATCH_MODES
+        mask: Optional single-channel mask (same size as the template); only pixels
+              where it is nonzero are compared, see TemplateCache.get_masked
+    
+    Returns:
+        Tuple of (score, (x, y)) for the best match, relative to the screenshot
+    """
+    if mode == "pyramid":
+        return _match_pyramid(screenshot, template, threshold, mask)
+    if mode == "tiled":
+        return _match_tiled(screenshot, template, threshold, mask)
+    result = _match_scores(screenshot, template, mask)
+    min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+    return (max_val, max_loc)
+
+
+def _match_pyramid(screenshot: np.ndarray, template: np.ndarray, threshold: float,
+                   mask: Optional[np.ndarray] = None) -> Tuple[float, Tuple[int, int]]:
+    """
+    Coarse-to-fine template matching
+    
+    Matches a downscaled template against a downscaled screenshot, then re-runs the
+    exact match in a small full-resolution window around each coarse candidate. The
+    returned score is always a full-resolution score, so it compares against the
+    same threshold as the exact path: when no candidate is good enough to refine,
+    the best coarse location is scored at full resolution and returned as is.
+    """
+    template_h, template_w = template.shape[:2]
+    
+    # Largest power-of-two downscale that keeps the template usable
+    downscale = 1
+    while (downscale * 2 <= PYRAMID_MAX_DOWNSCALE and
+           min(template_h, template_w) // (downscale * 2) >= PYRAMID_MIN_TEMPLATE_SIZE):
+        downscale *= 2
+    if downscale == 1:
+        return match_template(screenshot, template, threshold, mask=mask)
+    
+    factor = 1.0 / downscale
+    small_screen = cv2.resize(screenshot, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+    small_template = cv2.resize(template, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+    small_mask = None
+    if mask is not None:
+        small_mask = cv2.resize(mask, (small_template.shape[1], small_template.shape[0]),
+                                interpolation=cv2.INTER_NEAREST)
+        if not small_mask.any():
+            # Too little opaque area survives the downscale
+            return match_template(screenshot, template, threshold, mask=mask)
+    coarse = _match_scores(small_screen, small_template, small_mask)
+    
+    small_h, small_w = small_template.shape[:2]
+    screen_h, screen_w = screenshot.shape[:2]
+    pad = downscale + 1
+    best = None
+    fallback = None
+    
+    for _ in range(PYRAMID_MAX_CANDIDATES):
+        _, coarse_val, _, (cx, cy) = cv2.minMaxLoc(coarse)
+        if fallback is None:
+            # Location used if no candidate is refined: the coarse peak at full-resolution coordinates
+            fallback = (min(cx * downscale, screen_w - template_w), min(cy * downscale, screen_h - template_h))
+        if coarse_val < threshold - PYRAMID_SCORE_SLACK:
+            break
+        
+        # Refine in a full-resolution window around the candidate
+        x0 = max(0, cx * downscale - pad)
+        y0 = max(0, cy * downscale - pad)
+        x1 = min(screen_w, cx * downscale + template_w + pad)
+        y1 = min(screen_h, cy * downscale + template_h + pad)
+        window = screenshot[y0:y1, x0:x1]
+        if window.shape[0] >= template_h and window.shape[1] >= template_w:
+            result = _match_scores(window, template, mask)
+            _, val, _, (fx, fy) = cv2.minMaxLoc(result)
+            if best is None or val > best[0]:
+                best = (val, (x0 + fx, y0 + fy))
+        
+        # Suppress this peak so the next iteration finds a different candidate
+        coarse[max(0, cy - small_h // 2):cy + small_h // 2 + 1,
+               max(0, cx - small_w // 2):cx + small_w // 2 + 1] = -1.0
+    
+    if best is not None:
+        return best
+    x, y = fallback
+    score = _match_scores(screenshot[y:y + template_h, x:x + template_w], template, mask)[0, 0]
+    return (float(score), fallback)
+
+
+def _get_tile_pool() -> ThreadPoolExecutor:
+    """Create the shared tiled-matching thread pool on first use"""
+    global _tile_pool
+    with _tile_pool_lock:
+        if _tile_pool is None:
+            _tile_pool = ThreadPoolExecutor(max_workers=TILE_WORKERS, thread_name_prefix="TileMatch")
+        return _tile_pool
+
+
+def _match_tiled(screenshot: np.ndarray, template: np.ndarray, threshold: float,
+                 mask: Optional[np.ndarray] = None) -> Tuple[float, Tuple[int, int]]:
+    """
+    Template matching split across CPU cores
+    
+    The frame is cut into horizontal bands that overlap by the template height, so
+    every match position belongs to exactly one band. Bands are matched on the shared
+    thread pool and their maxima merged. As soon as one band reaches the threshold its
+    match is returned without waiting for the rest, so with several on-screen matches
+    the result may be any match above the threshold rather than the highest scoring one.
+    """
+    template_h, template_w = template.shape[:2]
+    result_h = screenshot.shape[0] - template_h + 1
+    tiles = min(TILE_WORKERS * 2, result_h)
+    if tiles < 2 or result_h <= 0:
+        return match_template(screenshot, template, threshold, mask=mask)
+    
+    def match_band(y0, y1):
+        # Result rows [y0, y1) need frame rows [y0, y1 + template_h - 1)
+        result = _match_scores(screenshot[y0:y1 + template_h - 1], template, mask)
+        _, max_val, _, (x, y) = cv2.minMaxLoc(result)
+        return (max_val, (x, y0 + y))
+    
+    bounds = [result_h * i // tiles for i in range(tiles + 1)]
+    pool = _get_tile_pool()
+    pending = {pool.submit(match_band, bounds[i], bounds[i + 1]) for i in range(tiles)}
+    best = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            score, loc = future.result()
+            if best is None or score > best[0]:
+                best = (score, loc)
+        if best[0] >= threshold:
+            # Early exit: drop bands that haven't started yet
+            for future in pending:
+                future.cancel()
+            break
+    return best
+
+
+def find_peaks(scores: np.ndarray, threshold: float, neighborhood: Tuple[int, int],
+               max_peaks: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find local maxima of a match score map
+    
+    A pixel is a peak if it reaches the threshold and equals the maximum of its
+    neighborhood (dilate-and-compare), so a blob of high scores around one match
+    yields one candidate instead of every pixel above the threshold.
+    
+    Args:
+        scores: Score map from cv2.matchTemplate
+        threshold: Minimum score of a peak
+        neighborhood: (width, height) of the window a peak must be the maximum of
+        max_peaks: Keep only this many of the highest peaks
+    
+    Returns:
+        Tuple of (locations, peak_scores): an (N, 2) array of (x, y) positions and
+        their scores, sorted from highest to lowest score
+    """
+    width, height = neighborhood
+    kernel = np.ones((max(1, height), max(1, width)), dtype=np.uint8)
+    local_max = cv2.dilate(scores, kernel)
+    ys, xs = np.nonzero((scores >= threshold) & (scores >= local_max))
+    peak_scores = scores[ys, xs]
+    order = np.argsort(-peak_scores, kind="stable")
+    if max_peaks is not None:
+        order = order[:max_peaks]
+    return (np.stack([xs[order], ys[order]], axis=1), peak_scores[order])
+
+
+def crop_region(screenshot: np.ndarray, origin: Tuple[int, int],
+                region: Optional[dict]) -> Optional[Tuple[np.ndarray, Tuple[int, int]]]:
+    """
+    Cut a screen-space region out of a captured frame without copying
+    
+    Args:
+        screenshot: Captured frame
+        origin: Screen position (left, top) of the frame's top-left pixel
+        region: Dict with 'left', 'top', 'width', 'height' in screen coordinates, or None
+    
+    Returns:
+        Tuple of (view, (left, top)) clipped to the frame, or None if the region is outside it
+    """
+    if not region:
+        return (screenshot, origin)
+    frame_h, frame_w = screenshot.shape[:2]
+    x0 = max(0, region["left"] - origin[0])
+    y0 = max(0, region["top"] - origin[1])
+    x1 = min(frame_w, region["left"] - origin[0] + region["width"])
+    y1 = min(frame_h, region["top"] - origin[1] + region["height"])
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return (screenshot[y0:y1, x0:x1], (origin[0] + x0, origin[1] + y0))
+
+
+def match_in_frame(screenshot: np.ndarray, origin: Tuple[int, int], template: np.ndarray,
+                   threshold: float, mode: str = "exact", region: Optional[dict] = None,
+                   hint: Optional[dict] = None,
+                   mask: Optional[np.ndarray] = None) -> Optional[Tuple[float, Tuple[int, int, int, int], bool]]:
+    """
+    Match a template inside a screen-space area of a captured frame
+    
+    Args:
+        screenshot: Captured BGR frame
+        origin: Screen position (left, top) of the frame's top-left pixel
+        template: Template to search for
+        threshold: Confidence the caller will accept
+        mode: One of MATCH_MODES for the full search
+        region: Optional screen-space search area
+        hint: Optional small screen-space window (e.g. around the last hit) tried
+              first; the full search only runs if the hint window misses
+        mask: Optional template mask (see match_template)
+    
+    Returns:
+        Tuple of (score, (x, y, width, height) in screen coordinates, found_in_hint),
+        or None if the area is outside the frame or smaller than the template
+    """
+    template_h, template_w = template.shape[:2]
+    area = crop_region(screenshot, origin, region)
+    if area is None:
+        return None
+    view, view_origin = area
+    if view.shape[0] < template_h or view.shape[1] < template_w:
+        return None
+    
+    if hint:
+        hint_area = crop_region(view, view_origin, hint)
+        if hint_area is not None:
+            hint_view, (left, top) = hint_area
+            if hint_view.shape[0] >= template_h and hint_view.shape[1] >= template_w:
+                score, (x, y) = match_template(hint_view, template, threshold, mask=mask)
+                if score >= threshold:
+                    return (score, (left + x, top + y, template_w, template_h), True)
+    
+    left, top = view_origin
+    score, (x, y) = match_template(view, template, threshold, mode, mask)
+    return (score, (left + x, top + y, template_w, template_h), False)
+
+
+def match_templates(screenshot: np.ndarray, jobs: Dict[Hashable, dict],
+                    origin: Tuple[int, int] = (0, 0)) -> Dict[Hashable, Optional[Tuple[float, Tuple[int, int, int, int], bool]]]:
+    """
+    Match many templates against one captured frame
+    
+    The frame is captured once by the caller and converted at most once per
+    color mode, so the cost of a detection cycle grows with the number of
+    templates, not with captures.
+    
+    Args:
+        screenshot: Captured BGR frame shared by every job
+        jobs: Mapping of key -> dict with 'template' and 'threshold', plus optional
+              'mode' (one of MATCH_MODES), 'color_mode' (one of COLOR_MODES, the
+              template must already be in that layout, see TemplateCache.get),
+              'mask' (template mask, see TemplateCache.get_masked), 'region'
+              (screen-space search area) and 'hint' (screen-space window tried
+              before the full search)
+        origin: Screen position (left, top) of the frame's top-left pixel
+    
+    Returns:
+        Mapping of key -> (score, (x, y, width, height) in screen coordinates,
+        found_in_hint) for the best match of each job, or None when the job couldn't
+        be matched (region outside the frame or smaller than the template). Callers
+        compare the score against their own threshold.
+    """
+    results = {}
+    converted = {"color": screenshot}
+    for key, job in jobs.items():
+        try:
+            color_mode = job.get("color_mode", "color")
+            if color_mode not in converted:
+                converted[color_mode] = convert_color(screenshot, color_mode)
+            results[key] = match_in_frame(converted[color_mode], origin, job["template"], job["threshold"],
+                                          job.get("mode", "exact"), job.get("region"), job.get("hint"),
+                                          job.get("mask"))
+        except (cv2.error, ValueError):
+            # e.g. a template whose channel layout doesn't match the frame; skip just this job
+            results[key] = None
+    return results
+
+
+# Display scaling settings offered by Windows (100% to 200%)
+DISPLAY_SCALES = (1.0, 1.25, 1.5, 1.75, 2.0)
+# Template sizes tried by scale search: every ratio between two display scalings,
+# i.e. any recording scale played back at any other
+TEMPLATE_SCALES = tuple(sorted({round(a / b, 2) for a in DISPLAY_SCALES for b in DISPLAY_SCALES}))
+
+
+class TemplateScaleIndex:
+    """
+    Precomputed scale pyramids of template images
+    
+    Every template is resized to each of TEMPLATE_SCALES once. The resized set
+    is saved next to the template (in a .scale_cache folder) and only rebuilt
+    when the template file changes, so later sessions load it instead.
+    """
+    
+    CACHE_DIR = ".scale_cache"
+    
+    def __init__(self, scales: Tuple[float, ...] = TEMPLATE_SCALES):
+        """
+        Args:
+            scales: Scale factors relative to the template's recorded size
+        """
+        self.scales = tuple(scales)
+        self._entries = {}  # path -> ((mtime_ns, size), {color_mode: [(scale, template, mask)]})
+        self._lock = threading.Lock()
+    
+    def get(self, template_path,
+            color_mode: str = "color") -> Optional[List[Tuple[float, np.ndarray, Optional[np.ndarray]]]]:
+        """
+        Get a template at every scale
+        
+        Args:
+            template_path: Path to the template image file
+            color_mode: One of COLOR_MODES
+        
+        Returns:
+            List of (scale, read-only template, read-only mask or None), or None if
+            the file can't be read
+        """
+        path = os.path.abspath(str(template_path))
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stamp:
+                if color_mode in entry[1]:
+                    return entry[1][color_mode]
+                levels = entry[1]["color"]
+            else:
+                levels = None
+        
+        if levels is None:
+            levels = self._load(path, stamp)
+            if levels is None:
+                return None
+        
+        converted = levels
+        if color_mode != "color":
+            converted = []
+            for scale, template, mask in levels:
+                template = convert_color(template, color_mode)
+                template.setflags(write=False)
+                converted.append((scale, template, mask))
+        
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != stamp:
+                entry = (stamp, {"color": levels})
+                self._entries[path] = entry
+            entry[1][color_mode] = converted
+        return converted
+    
+    def _cache_file(self, path: str) -> str:
+        """Path of the on-disk scale cache for a template"""
+        return os.path.join(os.path.dirname(path), self.CACHE_DIR, os.path.basename(path) + ".npz")
+    
+    def _load(self, path: str, stamp: Tuple[int, int]) -> Optional[List[Tuple[float, np.ndarray, Optional[np.ndarray]]]]:
+        """Load the BGR scale pyramid from disk, building (and saving) it if it's missing or stale"""
+        cache_file = self._cache_file(path)
+        try:
+            with np.load(cache_file) as data:
+                if tuple(data["stamp"]) == stamp and tuple(data["scales"]) == self.scales:
+                    levels = []
+                    for i, scale in enumerate(self.scales):
+                        template = data[f"template_{i}"]
+                        mask = data[f"mask_{i}"] if f"mask_{i}" in data.files else None
+                        template.setflags(write=False)
+                        if mask is not None:
+                            mask.setflags(write=False)
+                        levels.append((scale, template, mask))
+                    return levels
+        except (OSError, ValueError, KeyError):
+            # Missing, unreadable or from an older format; rebuild below
+            pass
+        
+        levels = self._build(path)
+        if levels is None:
+            return None
+        arrays = {"stamp": np.array(stamp, dtype=np.int64), "scales": np.array(self.scales)}
+        for i, (scale, template, mask) in enumerate(levels):
+            arrays[f"template_{i}"] = template
+            if mask is not None:
+                arrays[f"mask_{i}"] = mask
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            # Write to a temporary file first so a crash never leaves a half-written cache
+            temp_file = cache_file + ".tmp.npz"
+            np.savez(temp_file, **arrays)
+            os.replace(temp_file, cache_file)
+        except OSError as e:
+            print(f"Could not save template scales for {path}: {e}")
+        return levels
+    
+    def _build(self, path: str) -> Optional[List[Tuple[float, np.ndarray, Optional[np.ndarray]]]]:
+        """Resize a template (and its mask) to every scale"""
+        loaded = template_cache.get_masked(path)
+        if loaded is None:
+            return None
+        template, mask = loaded
+        height, width = template.shape[:2]
+        levels = []
+        for scale in self.scales:
+            if scale == 1.0:
+                levels.append((scale, template, mask))
+                continue
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+            scaled = cv2.resize(template, size, interpolation=interpolation)
+            scaled.setflags(write=False)
+            scaled_mask = None
+            if mask is not None:
+                scaled_mask = cv2.resize(mask, size, interpolation=cv2.INTER_NEAREST)
+                scaled_mask.setflags(write=False)
+            levels.append((scale, scaled, scaled_mask))
+        return levels
+
+
+# Shared scale pyramids (built once per template, cached on disk)
+scale_index = TemplateScaleIndex()
+
+
+class ScaleSearch:
+    """
+    Template search across display scaling changes
+    
+    Tries the template at the scales most likely to match first: the scale this
+    search last matched at, the scale the session last matched anything at, then
+    the scale expected from the display settings and the recorded size, then the
+    rest from nearest to farthest. Remembered scales last for the whole session.
+    """
+    
+    def __init__(self, index: Optional[TemplateScaleIndex] = None):
+        """
+        Args:
+            index: Scale pyramids to search with (defaults to the shared scale_index)
+        """
+        self.index = index or scale_index
+        self.session_scale = None
+        self._scales = {}  # key -> scale of its last match
+    
+    def order(self, scales, key: Hashable = None, likely_scale: float = 1.0) -> List[float]:
+        """
+        Order scales from most to least likely to match
+        
+        Args:
+            scales: Available scales
+            key: Search key whose last matching scale is tried first
+            likely_scale: Scale expected from the display settings
+        
+        Returns:
+            The scales, most likely first
+        """
+        scales = list(scales)
+        first = []
+        for preferred in (self._scales.get(key), self.session_scale, likely_scale, 1.0):
+            if preferred is None:
+                continue
+            nearest = min(scales, key=lambda scale: abs(scale - preferred))
+            if nearest not in first:
+                first.append(nearest)
+        rest = sorted((scale for scale in scales if scale not in first),
+                      key=lambda scale: abs(math.log(scale / likely_scale)))
+        return first + rest
+    
+    def match(self, screenshot: np.ndarray, origin: Tuple[int, int], template_path, threshold: float,
+              mode: str = "exact", color_mode: str = "color", region: Optional[dict] = None,
+              hint: Optional[dict] = None, key: Hashable = None,
+              likely_scale: float = 1.0) -> Optional[Tuple[float, Tuple[int, int, int, int], bool, float]]:
+        """
+        Match a template at several scales, stopping at the first scale that reaches the threshold
+        
+        Args:
+            screenshot: Captured frame, already in `color_mode`'s layout
+            origin: Screen position (left, top) of the frame's top-left pixel
+            template_path: Path to the template image file
+            threshold: Confidence the caller will accept
+            mode: One of MATCH_MODES
+            color_mode: One of COLOR_MODES
+            region: Optional screen-space search area
+            hint: Optional screen-space window tried first at each scale
+            key: Identifies the search so its matching scale is remembered
+            likely_scale: Scale expected from the display settings
+        
+        Returns:
+            Tuple of (score, (x, y, width, height) in screen coordinates, found_in_hint, scale)
+            for the first scale that matched (or the best scale if none did), or None if
+            the template can't be loaded or doesn't fit the search area at any scale
+        """
+        levels = self.index.get(template_path, color_mode)
+        if not levels:
+            return None
+        by_scale = {scale: (template, mask) for scale, template, mask in levels}
+        best = None
+        for scale in self.order(by_scale, key, likely_scale):
+            template, mask = by_scale[scale]
+            result = match_in_frame(screenshot, origin, template, threshold, mode, region, hint, mask)
+            if result is None:
+                continue
+            if best is None or result[0] > best[0]:
+                best = result + (scale,)
+            if result[0] >= threshold:
+                self._scales[key] = scale
+                self.session_scale = scale
+                break
+        return best
+
+
+class SearchHints:
+    """
+    Last-known-location hints for repeated searches
+    
+    Remembers where each search (keyed by step, item, ...) last found its target.
+    window() returns a small area around that spot to try before the full frame,
+    and the hit/miss counters show how often the hint saved a full search.
+    Searches where the target wasn't on screen at all are counted separately
+    as absent, since no hint could have found them.
+    """
+    
+    def __init__(self, margin: int = 24):
+        """
+        Args:
+            margin: Pixels added around the last hit on every side
+        """
+        self.margin = margin
+        self._last = {}   # key -> (x, y, width, height) of the last hit
+        self._stats = {}  # key -> [hint hits, hint misses, target absent]
+    
+    def window(self, key: Hashable) -> Optional[dict]:
+        """Screen-space area around the key's last hit, or None if it hasn't been found yet"""
+        box = self._last.get(key)
+        if box is None:
+            return None
+        x, y, width, height = box
+        return {
+            "left": x - self.margin,
+            "top": y - self.margin,
+            "width": width + 2 * self.margin,
+            "height": height + 2 * self.margin
+        }
+    
+    def record(self, key: Hashable, box: Optional[Tuple[int, int, int, int]], from_hint: bool):
+        """
+        Record the outcome of a search that may have used the hint window
+        
+        Args:
+            key: Search key
+            box: Screen-space box of the match, or None if not found
+            from_hint: Whether the match came from the hint window
+        """
+        if key in self._last:
+            stats = self._stats.setdefault(key, [0, 0, 0])
+            if box is None:
+                stats[2] += 1
+            else:
+                stats[0 if from_hint else 1] += 1
+        if box is not None:
+            self._last[key] = box
+    
+    def hit_rate(self, key: Hashable) -> Optional[float]:
+        """Fraction of hinted searches that found the target in the hint window (None if none found it)"""
+        hits, misses, absent = self._stats.get(key, (0, 0, 0))
+        total = hits + misses
+        return hits / total if total else None
+    
+    def stats(self) -> Dict[Hashable, dict]:
+        """Per-key hint hits, misses, absent count and hit rate (None if no hinted search found the target)"""
+        return {
+            key: {"hits": hits, "misses": misses, "absent": absent,
+                  "hit_rate": hits / (hits + misses) if hits + misses else None}
+            for key, (hits, misses, absent) in self._stats.items()
+        }
+
+
+class ChangeDetector:
+    """
+    Skips template matching on search areas that haven't changed
+    
+    Each search area is reduced to a grid of cell averages (a tile-diff signature).
+    After a negative match the signature is remembered; the next search with the
+    same key is skipped if no cell moved by more than the threshold.
+    """
+    
+    def __init__(self, cell_size: int = 16, threshold: int = 2):
+        """
+        Args:
+            cell_size: Side of each averaged cell in pixels
+            threshold: Largest per-cell change (0-255) still treated as "unchanged"
+        """
+        self.cell_size = cell_size
+        self.threshold = threshold
+        self.checked = 0
+        self.skipped = 0
+        # True when the last should_match saw an area that differs from its previous miss
+        self.last_changed = False
+        self._negative = {}  # key -> signature of the area at the last negative result
+        self._pending = {}   # key -> signature computed by the last should_match
+    
+    def signature(self, image: np.ndarray) -> np.ndarray:
+        """Downsample an image to one averaged pixel per cell"""
+        height, width = image.shape[:2]
+        size = (max(1, -(-width // self.cell_size)), max(1, -(-height // self.cell_size)))
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    
+    def should_match(self, key: Hashable, image: np.ndarray) -> bool:
+        """
+        Decide whether a search area needs to be matched
+        
+        Args:
+            key: Identifies the search (e.g. a step or item)
+            image: Current pixels of the search area
+        
+        Returns:
+            False if the area is unchanged since this key's last negative result
+        """
+        self.checked += 1
+        sig = self.signature(image)
+        last = self._negative.get(key)
+        if last is not None and last.shape == sig.shape and cv2.absdiff(last, sig).max() <= self.threshold:
+            self.skipped += 1
+            self.last_changed = False
+            return False
+        self.last_changed = last is not None
+        self._pending[key] = sig
+        return True
+    
+    def record_result(self, key: Hashable, found: bool):
+        """
+        Record the outcome of a match started after should_match returned True
+        
+        Args:
+            key: Same key passed to should_match
+            found: Whether the template was found
+        """
+        sig = self._pending.pop(key, None)
+        if found or sig is None:
+            self._negative.pop(key, None)
+        else:
+            self._negative[key] = sig
+    
+    def reset(self, key: Optional[Hashable] = None):
+        """Forget one key (or all keys), forcing the next search to match"""
+        if key is None:
+            self._negative.clear()
+            self._pending.clear()
+        else:
+            self._negative.pop(key, None)
+            self._pending.pop(key, None)
+
+
+class PollPolicy:
+    """
+    Adaptive interval between searches while waiting for an image
+    
+    Polls at min_interval for the first moments of a wait (when the target usually
+    appears), then backs off exponentially up to max_interval, and snaps back to
+    min_interval whenever a screen change is detected.
+    """
+    
+    def __init__(self, min_interval: float = 0.1, max_interval: float = 1.0,
+                 backoff: float = 1.5, fast_period: float = 1.0):
+        """
+        Args:
+            min_interval: Fastest poll interval in seconds
+            max_interval: Slowest poll interval in seconds
+            backoff: Factor applied to the interval after each unchanged miss
+            fast_period: Seconds after reset() (or a change) that keep polling at min_interval
+        
+        Raises:
+            ValueError: If min_interval isn't positive (the wait would busy-spin) or
+                max_interval is below it
+        """
+        if not min_interval > 0:
+            raise ValueError(f"Fastest poll interval must be above 0 seconds, got {min_interval}")
+        if max_interval < min_interval:
+            raise ValueError(f"Slowest poll interval ({max_interval}) is below the fastest ({min_interval})")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.fast_period = fast_period
+        self.reset()
+    
+    def reset(self):
+        """Start a new wait at the fastest interval"""
+        self.interval = self.min_interval
+        self._fast_until = time.monotonic() + self.fast_period
+    
+    def next_interval(self, changed: bool = False) -> float:
+        """
+        Get the time to sleep before the next search
+        
+        Args:
+            changed: Whether the last search saw the screen change
+        
+        Returns:
+            Interval in seconds
+        """
+        now = time.monotonic()
+        if changed:
+            self.interval = self.min_interval
+            self._fast_until = now + self.fast_period
+        elif now >= self._fast_until:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+        return self.interval
 
 
 class ImageDetector:
     """Handles image detection and screen capture operations"""
     
-    def __init__(self, confidence_threshold: float = 0.8):
+    def __init__(self, confidence_threshold: float = 0.8, match_mode: str = "exact",
+                 color_mode: str = "color"):
         """
         Initialize the image detector
         
         Args:
             confidence_threshold: Minimum confidence score for template matching (0-1)
+            match_mode: Default matching mode for find_image (one of MATCH_MODES)
+            color_mode: Default color mode for loading and matching (one of COLOR_MODES)
         """
         self.confidence_threshold = confidence_threshold
-        self.sct = mss.mss()
+        self.match_mode = match_mode
+        self.color_mode = color_mode
+        self.screen = screen_capture
+        self._local = threading.local()
     
     def capture_screen(self, region: Optional[dict] = None) -> np.ndarray:
         """
@@ -30,63 +1422,113 @@ class ImageDetector:
         Returns:
             Screenshot as numpy array in BGR format
         """
-        if region is None:
-            monitor = self.sct.monitors[1]  # Primary monitor
-        else:
-            monitor = {
-                "top": region["top"],
-                "left": region["left"],
-                "width": region["width"],
-                "height": region["height"]
-            }
+        return self.screen.grab(region)
+    
+    def _capture_reused(self, region: Optional[dict] = None) -> np.ndarray:
+        """
+        Capture into this thread's reusable buffer
         
-        screenshot = self.sct.grab(monitor)
-        img = np.array(screenshot)
-        # Convert BGRA to BGR
-        img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
-        return img
+        Only for screenshots that don't leave the detector: the next capture on
+        the same thread overwrites the pixels.
+        """
+        buffer = self.screen.grab(region, dst=getattr(self._local, "buffer", None))
+        self._local.buffer = buffer
+        return buffer
     
-    def load_template(self, template_path: str) -> np.ndarray:
+    def load_template(self, template_path: str, color_mode: Optional[str] = None) -> np.ndarray:
         """
         Load a template image from file
         
         Args:
             template_path: Path to the template image file
+            color_mode: Color mode override (defaults to self.color_mode)
         
         Returns:
-            Template image as numpy array in BGR format
+            Template image as numpy array (BGR, or single-channel for the other color modes)
         """
-        template = cv2.imread(template_path)
+        template = template_cache.get(template_path, color_mode or self.color_mode)
         if template is None:
             raise FileNotFoundError(f"Template image not found: {template_path}")
         return template
     
-    def find_image(self, template: np.ndarray, region: Optional[dict] = None) -> Optional[Tuple[int, int, int, int]]:
+    def find_image(self, template: np.ndarray, region: Optional[dict] = None,
+                   mode: Optional[str] = None,
+                   color_mode: Optional[str] = None) -> Optional[Tuple[int, int, int, int]]:
         """
         Find a template image on the screen
         
         Args:
             template: Template image to search for (numpy array)
             region: Optional region to search in
+            mode: Matching mode override (defaults to self.match_mode)
+            color_mode: Color mode override (defaults to self.color_mode)
         
         Returns:
-            Tuple of (x, y, width, height) if found, None otherwise
+            Tuple of (x, y, width, height) in screen coordinates if found, None otherwise
+        """
+        screenshot = self._capture_reused(region)
+        return self._match(screenshot, template, region, mode, color_mode)
+    
+    def _match(self, screenshot: np.ndarray, template: np.ndarray, region: Optional[dict] = None,
+               mode: Optional[str] = None,
+               color_mode: Optional[str] = None) -> Optional[Tuple[int, int, int, int]]:
         """
-        screenshot = self.capture_screen(region)
+        Match a template against an already captured screenshot
         
-        # Perform template matching
-        result = cv2.matchTemplate(screenshot, template, cv2.TM_CCOEFF_NORMED)
-        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+        Args:
+            screenshot: Capture of `region` (or the whole monitor)
+            template: Template image to search for (BGR, or already in the color mode's layout)
+            region: Region the screenshot was taken from
+            mode: Matching mode override (defaults to self.match_mode)
+            color_mode: Color mode override (defaults to self.color_mode)
+        
+        Returns:
+            Tuple of (x, y, width, height) in screen coordinates if found, None otherwise
+        """
+        color_mode = color_mode or self.color_mode
+        max_val, max_loc = match_template(convert_color(screenshot, color_mode), convert_color(template, color_mode),
+                                          self.confidence_threshold, mode or self.match_mode)
         
         if max_val >= self.confidence_threshold:
             template_h, template_w = template.shape[:2]
+            origin_x, origin_y = self._origin(region)
             x, y = max_loc
-            return (x, y, template_w, template_h)
+            return (origin_x + x, origin_y + y, template_w, template_h)
         
         return None
     
+    def find_images(self, templates: Dict[Hashable, np.ndarray], region: Optional[dict] = None,
+                    mode: Optional[str] = None,
+                    color_mode: Optional[str] = None) -> Dict[Hashable, Optional[Tuple[int, int, int, int]]]:
+        """
+        Find several templates using a single screen capture
+        
+        Args:
+            templates: Mapping of name -> template image
+            region: Optional region to search in
+            mode: Matching mode override (defaults to self.match_mode)
+            color_mode: Color mode override (defaults to self.color_mode); the frame
+                        is converted once and shared by every template
+        
+        Returns:
+            Mapping of name -> (x, y, width, height) in screen coordinates, or None if not found
+        """
+        screenshot = self._capture_reused(region)
+        color_mode = color_mode or self.color_mode
+        jobs = {
+            name: {"template": convert_color(template, color_mode), "threshold": self.confidence_threshold,
+                   "mode": mode or self.match_mode, "color_mode": color_mode}
+            for name, template in templates.items()
+        }
+        results = match_templates(screenshot, jobs, self._origin(region))
+        return {
+            name: (result[1] if result is not None and result[0] >= self.confidence_threshold else None)
+            for name, result in results.items()
+        }
+    
     def find_all_images(self, template: np.ndarray, region: Optional[dict] = None, 
-                       threshold: Optional[float] = None) -> List[Tuple[int, int, int, int]]:
+                       threshold: Optional[float] = None, top_k: Optional[int] = None,
+                       overlap_thresh: float = 0.3, with_scores: bool = False) -> List[tuple]:
         """
         Find all instances of a template image on the screen
         
@@ -94,54 +1536,88 @@ class ImageDetector:
             template: Template image to search for
             region: Optional region to search in
             threshold: Optional custom threshold (overrides instance threshold)
+            top_k: Return at most this many matches (the highest scoring ones)
+            overlap_thresh: Maximum overlap ratio between two returned matches
+            with_scores: Return (box, score) pairs instead of just the boxes
         
         Returns:
-            List of tuples (x, y, width, height) for all matches found
+            List of (x, y, width, height) tuples in screen coordinates for all matches
+            found, highest score first; ((x, y, width, height), score) pairs if
+            with_scores is set
         """
-        screenshot = self.capture_screen(region)
+        screenshot = convert_color(self._capture_reused(region), self.color_mode)
+        template = convert_color(template, self.color_mode)
         threshold = threshold or self.confidence_threshold
         
-        result = cv2.matchTemplate(screenshot, template, cv2.TM_CCOEFF_NORMED)
+        result = _match_scores(screenshot, template)
         template_h, template_w = template.shape[:2]
+        origin_x, origin_y = self._origin(region)
+        
+        # One candidate per local maximum instead of every pixel above the threshold;
+        # the window is half the template so separate (barely overlapping) instances survive
+        locations, scores = find_peaks(result, threshold, (max(3, template_w // 2), max(3, template_h // 2)))
+        boxes = np.empty((len(locations), 4), dtype=np.int64)
+        boxes[:, 0] = locations[:, 0] + origin_x
+        boxes[:, 1] = locations[:, 1] + origin_y
+        boxes[:, 2] = template_w
+        boxes[:, 3] = template_h
         
-        # Find all locations above threshold
-        locations = np.where(result >= threshold)
-        matches = []
+        # Remove overlapping matches, keeping the best scoring one of each group
+        keep = self._non_max_suppression(boxes, overlap_thresh, scores, top_k)
+        matches = [tuple(int(v) for v in boxes[i]) for i in keep]
+        if with_scores:
+            return [(box, float(scores[i])) for box, i in zip(matches, keep)]
+        return matches
+    
+    def _origin(self, region: Optional[dict] = None) -> Tuple[int, int]:
+        """
+        Get the screen position of the top-left pixel of a capture
         
-        for pt in zip(*locations[::-1]):
-            matches.append((pt[0], pt[1], template_w, template_h))
+        Args:
+            region: Region that was captured, or None for the whole monitor
         
-        # Remove overlapping matches
-        return self._non_max_suppression(matches, 0.3)
+        Returns:
+            Tuple of (left, top) used to translate match positions to screen space
+        """
+        area = region if region is not None else self.screen.monitor()
+        return (area["left"], area["top"])
     
-    def _non_max_suppression(self, boxes: List[Tuple[int, int, int, int]], 
-                            overlap_thresh: float = 0.3) -> List[Tuple[int, int, int, int]]:
+    def _non_max_suppression(self, boxes, overlap_thresh: float = 0.3, scores: Optional[np.ndarray] = None,
+                             top_k: Optional[int] = None) -> List[int]:
         """
         Apply non-maximum suppression to remove overlapping boxes
         
+        Boxes are visited from the highest score down, so of every group of
+        overlapping boxes the best scoring one is kept.
+        
         Args:
-            boxes: List of (x, y, width, height) tuples
+            boxes: (x, y, width, height) boxes, as a list of tuples or an (N, 4) array
             overlap_thresh: Maximum allowed overlap ratio
+            scores: Optional score per box (without scores, boxes are visited in order)
+            top_k: Stop after selecting this many boxes
         
         Returns:
-            Filtered list of boxes
+            Indices of the kept boxes, highest score first
         """
         if len(boxes) == 0:
             return []
         
-        boxes_array = np.array(boxes)
+        boxes_array = np.asarray(boxes)
         x1 = boxes_array[:, 0]
         y1 = boxes_array[:, 1]
         x2 = x1 + boxes_array[:, 2]
         y2 = y1 + boxes_array[:, 3]
         
         areas = boxes_array[:, 2] * boxes_array[:, 3]
-        indices = np.arange(len(boxes_array))
+        if scores is None:
+            indices = np.arange(len(boxes_array))
+        else:
+            indices = np.argsort(-np.asarray(scores), kind="stable")
         
         selected = []
-        while len(indices) > 0:
+        while len(indices) > 0 and (top_k is None or len(selected) < top_k):
             i = indices[0]
-            selected.append(i)
+            selected.append(int(i))
             
             # Calculate overlap with remaining boxes
             xx1 = np.maximum(x1[i], x1[indices[1:]])
@@ -155,7 +1631,7 @@ class ImageDetector:
             overlap = (w * h) / areas[indices[1:]]
             indices = indices[np.where(overlap <= overlap_thresh)[0] + 1]
         
-        return [boxes[i] for i in selected]
+        return selected
     
     def get_center(self, box: Tuple[int, int, int, int]) -> Tuple[int, int]:
         """
@@ -171,31 +1647,114 @@ class ImageDetector:
         return (x + w // 2, y + h // 2)
     
     def wait_for_image(self, template: np.ndarray, timeout: float = 10.0, 
-                      check_interval: float = 0.5, region: Optional[dict] = None) -> Optional[Tuple[int, int, int, int]]:
+                      check_interval: float = 0.5, region: Optional[dict] = None,
+                      mode: Optional[str] = None,
+                      max_interval: Optional[float] = None,
+                      color_mode: Optional[str] = None,
+                      stop_event: Optional[threading.Event] = None) -> Optional[Tuple[int, int, int, int]]:
         """
         Wait for an image to appear on screen
         
         Args:
             template: Template image to wait for
             timeout: Maximum time to wait in seconds
-            check_interval: Time between checks in seconds
+            check_interval: Fastest time between checks in seconds
             region: Optional region to search in
+            mode: Matching mode override (defaults to self.match_mode)
+            max_interval: Slowest time between checks; checks back off from check_interval
+                          towards it while the screen is static (default 4x check_interval)
+            color_mode: Color mode override (defaults to self.color_mode)
+            stop_event: Optional event that ends the wait as soon as it is set
         
         Returns:
-            Box coordinates if found within timeout, None otherwise
+            Box coordinates if found within timeout, None otherwise (or when stopped)
+        
+        Raises:
+            ValueError: If check_interval isn't positive or max_interval is below it
         """
-        import time
         start_time = time.time()
+        changes = ChangeDetector()
+        poll = PollPolicy(check_interval, max_interval if max_interval is not None else check_interval * 4)
         
         while time.time() - start_time < timeout:
-            result = self.find_image(template, region)
-            if result is not None:
-                return result
-            time.sleep(check_interval)
+            if stop_event is not None and stop_event.is_set():
+                return None
+            screenshot = self._capture_reused(region)
+            # Only re-run the match when the search area changed since the last miss
+            if changes.should_match("wait", screenshot):
+                result = self._match(screenshot, template, region, mode, color_mode)
+                changes.record_result("wait", result is not None)
+                if result is not None:
+                    return result
+            remaining = timeout - (time.time() - start_time)
+            interval = max(0.0, min(poll.next_interval(changes.last_changed), remaining))
+            if stop_event is not None:
+                if stop_event.wait(interval):
+                    return None
+            else:
+                time.sleep(interval)
         
         return None
 
 
+class FrameContext:
+    """
+    One screen capture shared by every check of a macro tick
+    
+    The screen is captured on the first check and each template is matched
+    against that frame at most once; later checks of the same template reuse
+    the result. invalidate() drops the frame and the results, so call it when
+    a new tick starts and after sending input that may change the screen.
+    """
+    
+    def __init__(self, detector: ImageDetector, region: Optional[dict] = None):
+        """
+        Args:
+            detector: Detector used to capture and match
+            region: Optional region captured and searched
+        """
+        self.detector = detector
+        self.region = region
+        self.captures = 0
+        self.matches = 0
+        self._frame = None
+        self._results = {}  # key -> box or None
+    
+    @property
+    def frame(self) -> np.ndarray:
+        """The current frame, captured on first use"""
+        if self._frame is None:
+            self._frame = self.detector.capture_screen(self.region)
+            self.captures += 1
+        return self._frame
+    
+    @property
+    def origin(self) -> Tuple[int, int]:
+        """Screen position (left, top) of the frame's top-left pixel"""
+        return self.detector._origin(self.region)
+    
+    def find(self, key: Hashable, template: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Find a template in the current frame
+        
+        Args:
+            key: Identifies the template (e.g. its name); results are cached per key
+            template: Template image to search for
+        
+        Returns:
+            Tuple of (x, y, width, height) in screen coordinates if found, None otherwise
+        """
+        if key not in self._results:
+            self._results[key] = self.detector._match(self.frame, template, self.region)
+            self.matches += 1
+        return self._results[key]
+    
+    def invalidate(self):
+        """Forget the frame and every cached result; the next check captures again"""
+        self._frame = None
+        self._results.clear()
+
+
 def click_at(x: int, y: int, delay: float = 0.1):
     """
     Click at specific screen coordinates
@@ -205,8 +1764,9 @@ def click_at(x: int, y: int, delay: float = 0.1):
         y: Y coordinate
         delay: Delay after clicking in seconds
     """
-    pyautogui.click(x, y)
+    import pyautogui
     import time
+    pyautogui.click(x, y)
     time.sleep(delay)
 
 
@@ -219,4 +1779,5 @@ def move_to(x: int, y: int, duration: float = 0.2):
         y: Y coordinate
         duration: Time taken for movement in seconds
     """
+    import pyautogui
     pyautogui.moveTo(x, y, duration=duration)
@@ -0,0 +1,186 @@
+"""
+Mouse input backends for RobloxMacro
+Backends send input immediately with no built-in pauses; all timing is up to the caller
+"""
+
+import sys
+import time
+import abc
+import ctypes
+import ctypes.util
+from typing import Optional
+
+
+class InputBackend(abc.ABC):
+    """Sends mouse input; subclasses implement move/press/release"""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def move(self, x: int, y: int):
+        """Move the mouse to screen coordinates"""
+
+    @abc.abstractmethod
+    def press(self, button: str = "left"):
+        """Press a mouse button ('left', 'right' or 'middle')"""
+
+    @abc.abstractmethod
+    def release(self, button: str = "left"):
+        """Release a mouse button ('left', 'right' or 'middle')"""
+
+    def click(self, x: int, y: int, button: str = "left", hold: float = 0.0):
+        """
+        Click at screen coordinates
+
+        Args:
+            x: X coordinate
+            y: Y coordinate
+            button: Mouse button to click
+            hold: Seconds to keep the button down (0 = release immediately)
+        """
+        self.move(x, y)
+        self.press(button)
+        if hold > 0:
+            time.sleep(hold)
+        self.release(button)
+
+    def close(self):
+        """Release any resources held by the backend"""
+        pass
+
+
+class PyAutoGUIBackend(InputBackend):
+    """pyautogui without its automatic pause after every call"""
+
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+        self._pyautogui = pyautogui
+
+    def move(self, x: int, y: int):
+        # _pause=False skips pyautogui.PAUSE (0.1 s by default) for this call only,
+        # so other pyautogui users keep their behavior
+        self._pyautogui.moveTo(x, y, _pause=False)
+
+    def press(self, button: str = "left"):
+        self._pyautogui.mouseDown(button=button, _pause=False)
+
+    def release(self, button: str = "left"):
+        self._pyautogui.mouseUp(button=button, _pause=False)
+
+
+class PynputBackend(InputBackend):
+    """pynput mouse controller (the library simple_macro.py plays macros with)"""
+
+    name = "pynput"
+
+    def __init__(self):
+        from pynput.mouse import Button, Controller
+        self._mouse = Controller()
+        self._buttons = {"left": Button.left, "right": Button.right, "middle": Button.middle}
+
+    def move(self, x: int, y: int):
+        self._mouse.position = (x, y)
+
+    def press(self, button: str = "left"):
+        self._mouse.press(self._buttons[button])
+
+    def release(self, button: str = "left"):
+        self._mouse.release(self._buttons[button])
+
+
+class XTestBackend(InputBackend):
+    """
+    Raw X11 XTest events through ctypes (Linux/X11 only)
+
+    Each action is one fake event plus one XFlush. The display connection
+    is not thread-safe, so use one backend per thread.
+    """
+
+    name = "xtest"
+
+    BUTTONS = {"left": 1, "middle": 2, "right": 3}
+
+    def __init__(self, display: Optional[str] = None):
+        """
+        Args:
+            display: X display name (defaults to $DISPLAY)
+        """
+        x11_path = ctypes.util.find_library("X11")
+        xtst_path = ctypes.util.find_library("Xtst")
+        if not x11_path or not xtst_path:
+            raise RuntimeError("XTest backend needs libX11 and libXtst")
+        self._x11 = ctypes.cdll.LoadLibrary(x11_path)
+        self._xtst = ctypes.cdll.LoadLibrary(xtst_path)
+
+        self._x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        self._x11.XOpenDisplay.restype = ctypes.c_void_p
+        self._x11.XFlush.argtypes = [ctypes.c_void_p]
+        self._x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        self._xtst.XTestFakeMotionEvent.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int,
+                                                    ctypes.c_int, ctypes.c_ulong]
+        self._xtst.XTestFakeButtonEvent.argtypes = [ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+                                                    ctypes.c_ulong]
+
+        self._display = self._x11.XOpenDisplay(display.encode() if display else None)
+        if not self._display:
+            raise RuntimeError("Cannot open X display")
+
+    def move(self, x: int, y: int):
+        # Screen -1 = the screen the pointer is on
+        self._xtst.XTestFakeMotionEvent(self._display, -1, int(x), int(y), 0)
+        self._x11.XFlush(self._display)
+
+    def press(self, button: str = "left"):
+        self._xtst.XTestFakeButtonEvent(self._display, self.BUTTONS[button], 1, 0)
+        self._x11.XFlush(self._display)
+
+    def release(self, button: str = "left"):
+        self._xtst.XTestFakeButtonEvent(self._display, self.BUTTONS[button], 0, 0)
+        self._x11.XFlush(self._display)
+
+    def close(self):
+        if self._display:
+            self._x11.XCloseDisplay(self._display)
+            self._display = None
+
+
+BACKENDS = {
+    "pyautogui": PyAutoGUIBackend,
+    "pynput": PynputBackend,
+    "xtest": XTestBackend,
+}
+
+# Backends tried by "auto", fastest first
+if sys.platform.startswith("linux"):
+    AUTO_ORDER = ("xtest", "pynput", "pyautogui")
+else:
+    AUTO_ORDER = ("pynput", "pyautogui")
+
+
+def create_backend(name: str = "auto") -> InputBackend:
+    """
+    Create an input backend
+
+    Args:
+        name: One of BACKENDS, or "auto" for the first one that works here
+
+    Returns:
+        The backend
+
+    Raises:
+        ValueError: If the name is unknown
+        RuntimeError: If no requested backend can be used on this system
+    """
+    if name != "auto" and name not in BACKENDS:
+        raise ValueError(f"Unknown input backend: {name} (choose from auto, {', '.join(BACKENDS)})")
+
+    errors = []
+    for candidate in (AUTO_ORDER if name == "auto" else (name,)):
+        try:
+            return BACKENDS[candidate]()
+        except Exception as e:
+            # Missing library or no display; try the next one
+            errors.append(f"{candidate}: {e}")
+    raise RuntimeError("No usable input backend (" + "; ".join(errors) + ")")
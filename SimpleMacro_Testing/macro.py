@@ -6,16 +6,148 @@ Main script for running the macro with image detection
 import json
 import time
 import os
+import threading
 import keyboard
 import pyautogui
 from pathlib import Path
-from image_utils import ImageDetector, click_at, move_to
+from typing import List, Optional
+from image_utils import ImageDetector, FrameContext, match_templates, move_to, convert_color
+from input_backend import create_backend
+import template_bundle
 try:
     import pygetwindow as gw
 except ImportError:
     gw = None
 
 
+class MacroHalted(Exception):
+    """Raised before sending input while the macro is paused or stopped; run() ends the tick"""
+
+
+class RuleEngine:
+    """
+    Config-driven rules evaluated against one frame per tick
+    
+    Each entry of the "rules" list in config.json names a template and what to
+    do when it is on screen, e.g.:
+    
+        {"template": "close_button", "action": "click", "offset": [0, 0],
+         "priority": 10, "cooldown": 1.0, "region": null, "confidence": 0.85}
+        {"template": "enemy", "action": "key", "key": "space", "hold": 0.2}
+    
+    Only "template" is required. Every rule that isn't cooling down is matched
+    against the same capture in one batch, then matching rules fire from the
+    highest priority down, at most max_actions per tick. Input changes the
+    screen, so remaining rules are checked again on the next tick's fresh frame.
+    """
+    
+    ACTIONS = ("click", "key")
+    
+    def __init__(self, macro: "RobloxMacro", rules: List[dict], max_actions: int = 1):
+        """
+        Args:
+            macro: Macro providing the templates, frame context and config
+            rules: Rule dicts from config.json
+            max_actions: Most rules fired per tick
+        """
+        self.macro = macro
+        self.max_actions = max_actions
+        self.rules = []
+        for index, rule in enumerate(rules):
+            parsed = self._parse_rule(rule, index)
+            if parsed is not None:
+                self.rules.append(parsed)
+        # Highest priority first; the sort is stable, so config order breaks ties
+        self.rules.sort(key=lambda rule: -rule["priority"])
+        self._last_fired = {}  # rule index -> time.monotonic() it last fired
+    
+    def _parse_rule(self, rule: dict, index: int) -> Optional[dict]:
+        """Validate a rule from the config and fill in defaults (None if it can't be used)"""
+        template = rule.get("template")
+        if template not in self.macro.templates:
+            print(f"Rule {index + 1}: template '{template}' not loaded, skipping")
+            return None
+        action = rule.get("action", "click")
+        if action not in self.ACTIONS:
+            print(f"Rule {index + 1}: unknown action '{action}', skipping")
+            return None
+        if action == "key" and not rule.get("key"):
+            print(f"Rule {index + 1}: 'key' action needs a key, skipping")
+            return None
+        offset = rule.get("offset", [0, 0])
+        return {
+            "name": rule.get("name", template),
+            "template": template,
+            "action": action,
+            "key": rule.get("key"),
+            "hold": float(rule.get("hold", 0.05)),
+            "offset": (int(offset[0]), int(offset[1])),
+            "priority": float(rule.get("priority", 0)),
+            "cooldown": float(rule.get("cooldown", 0)),
+            "region": rule.get("region"),
+            "confidence": float(rule.get("confidence", self.macro.detector.confidence_threshold))
+        }
+    
+    def evaluate(self) -> List[str]:
+        """
+        Match every ready rule against the current frame and fire the best ones
+        
+        Returns:
+            Names of the rules that fired
+        """
+        now = time.monotonic()
+        ready = [
+            index for index, rule in enumerate(self.rules)
+            if now - self._last_fired.get(index, float("-inf")) >= rule["cooldown"]
+        ]
+        if not ready:
+            return []
+        
+        detector = self.macro.detector
+        jobs = {
+            index: {
+                "template": self.macro.templates[self.rules[index]["template"]],
+                "threshold": self.rules[index]["confidence"],
+                "mode": detector.match_mode,
+                "color_mode": detector.color_mode,
+                "region": self.rules[index]["region"]
+            }
+            for index in ready
+        }
+        frame = self.macro.frame
+        results = match_templates(frame.frame, jobs, frame.origin)
+        
+        fired = []
+        for index in ready:
+            rule = self.rules[index]
+            result = results.get(index)
+            if result is None or result[0] < rule["confidence"]:
+                continue
+            self._fire(rule, result[1])
+            self._last_fired[index] = time.monotonic()
+            fired.append(rule["name"])
+            if len(fired) >= self.max_actions:
+                break
+        return fired
+    
+    def _fire(self, rule: dict, box):
+        """Perform a rule's action for a match at `box`"""
+        self.macro.check_halted()
+        if rule["action"] == "click":
+            center_x, center_y = self.macro.detector.get_center(box)
+            click_x = center_x + rule["offset"][0]
+            click_y = center_y + rule["offset"][1]
+            self.macro.click(click_x, click_y)
+            print(f"Rule '{rule['name']}': clicked at ({click_x}, {click_y})")
+        else:
+            keyboard.press(rule["key"])
+            time.sleep(rule["hold"])
+            keyboard.release(rule["key"])
+            print(f"Rule '{rule['name']}': pressed '{rule['key']}'")
+        # The action may change the screen, so later checks need a new capture
+        self.macro.frame.invalidate()
+
+
 class RobloxMacro:
     """Main macro class for Roblox automation"""
     
@@ -30,11 +162,25 @@ class RobloxMacro:
         self.detector = ImageDetector(
             confidence_threshold=self.config["detection"]["confidence_threshold"]
         )
+        # Per-tick frame: image_exists/find_and_click share one capture until input is sent
+        self.frame = FrameContext(self.detector, self.config["detection"].get("region"))
+        # Mouse input without pyautogui's hidden 0.1 s pause; timing comes from the config
+        self.input = create_backend(self.config["actions"].get("input_backend", "auto"))
+        print(f"Input backend: {self.input.name}")
         self.running = False
         self.paused = False
+        # Hotkeys flip these; the main loop and every wait block on them instead of polling
+        self.active = threading.Event()   # set while running and not paused
+        self.halted = threading.Event()   # set while stopped or paused; interrupts waits
+        self.halted.set()
         self.templates = {}
         self.initial_sequence_done = False
         self._load_templates()
+        self.rules = RuleEngine(
+            self,
+            self.config.get("rules", []),
+            self.config.get("rule_engine", {}).get("max_actions_per_tick", 1)
+        )
         self._setup_hotkeys()
     
     def _load_config(self, config_path: str) -> dict:
@@ -43,25 +189,27 @@ class RobloxMacro:
             return json.load(f)
     
     def _load_templates(self):
-        """Load all template images from the images folder"""
+        """
+        Load all template images from the images folder
+        
+        Templates come memory-mapped from the folder's bundle (see template_bundle.py);
+        any the bundle is missing or has stale are decoded in parallel instead.
+        """
         template_folder = Path(self.config["images"]["template_folder"])
         
         if not template_folder.exists():
             print(f"Warning: Template folder '{template_folder}' not found")
             return
         
-        image_files = list(template_folder.glob("*.png")) + list(template_folder.glob("*.jpg"))
+        loaded, stats = template_bundle.load_templates(template_folder)
+        for template_name, template in loaded.items():
+            # No-op for the default color mode, so bundle templates stay memory-mapped
+            self.templates[template_name] = convert_color(template, self.detector.color_mode)
         
-        for img_path in image_files:
-            if img_path.name == "README.md":
-                continue
-            
-            try:
-                template_name = img_path.stem  # Filename without extension
-                self.templates[template_name] = self.detector.load_template(str(img_path))
-                print(f"Loaded template: {template_name}")
-            except Exception as e:
-                print(f"Failed to load {img_path.name}: {e}")
+        print(f"Loaded {len(loaded)} templates ({stats['mapped']} from bundle, "
+              f"{stats['decoded']} decoded): {', '.join(loaded)}")
+        if stats["decoded"] >= 20:
+            print(f"Tip: run 'python template_bundle.py build {template_folder}' for faster startup")
         
         if not self.templates:
             print("No template images found! Please add images to the 'images' folder.")
@@ -74,7 +222,8 @@ class RobloxMacro:
     
     def start(self):
         """Start the macro"""
-        if nif not self._check_roblox_running():
+        if not self.running:
+            if not self._check_roblox_running():
                 print("\n⚠️  Roblox is not detected! Please start Roblox first.")
                 return
             
@@ -85,25 +234,81 @@ class RobloxMacro:
             print(f"Press {self.config['hotkeys']['pause'].upper()} to pause")
             print(f"Press {self.config['hotkeys']['stop'].upper()} to stop\n")
             self._run_initial_sequence()
-            print(f"Press {self.config['hotkeys']['stop'].upper()} to stop\n")
+            # Start ticking once the initial sequence is done (unless stopped meanwhile)
+            self._set_active(self.running and not self.paused)
     
     def toggle_pause(self):
         """Toggle pause state"""
         if self.running:
             self.paused = not self.paused
+            self._set_active(not self.paused)
             if self.paused:
                 print("=== Macro Paused ===")
             else:
                 print("=== Macro Resumed ===")
-    self.initial_sequence_done = False
-            
+    
     def stop(self):
         """Stop the macro"""
         if self.running:
             self.running = False
             self.paused = False
+            self._set_active(False)
             print("\n=== Macro Stopped ===")
     
+    def _set_active(self, active: bool):
+        """Update the run/halt events; halting wakes every interruptible wait at once"""
+        if active:
+            self.halted.clear()
+            self.active.set()
+        else:
+            self.active.clear()
+            self.halted.set()
+    
+    def sleep(self, seconds: float) -> bool:
+        """
+        Sleep that ends early when the macro is paused or stopped
+        
+        Args:
+            seconds: Time to sleep
+        
+        Returns:
+            True if the full time passed, False if interrupted
+        """
+        return not self.halted.wait(seconds)
+    
+    def check_halted(self):
+        """
+        Abort the current tick if the macro has been paused or stopped
+        
+        Called before every input the macro sends, so once halted, the rest of
+        macro_logic doesn't fire clicks back to back with its delays skipped.
+        
+        Raises:
+            MacroHalted: If the macro is paused or stopped
+        """
+        if self.halted.is_set():
+            raise MacroHalted()
+    
+    def click(self, x: int, y: int):
+        """
+        Click at screen coordinates with the input backend
+        
+        Holds the button for actions.click_hold seconds (default 0) and then
+        waits actions.click_delay seconds; there are no other pauses.
+        
+        Args:
+            x: X coordinate
+            y: Y coordinate
+        
+        Raises:
+            MacroHalted: If the macro is paused or stopped (nothing is clicked)
+        """
+        self.check_halted()
+        actions = self.config["actions"]
+        self.input.click(x, y, hold=actions.get("click_hold", 0.0))
+        if actions["click_delay"] > 0:
+            self.sleep(actions["click_delay"])
+    
     def find_and_click(self, template_name: str, offset_x: int = 0, offset_y: int = 0) -> bool:
         """
         Find an image and click on it
@@ -115,19 +320,25 @@ class RobloxMacro:
         
         Returns:
             True if image was found and clicked, False otherwise
+        
+        Raises:
+            MacroHalted: If the macro is paused or stopped
         """
+        self.check_halted()
         if template_name not in self.templates:
             print(f"Template '{template_name}' not found")
             return False
         
         template = self.templates[template_name]
-        box = self.detector.find_image(template, self.config["detection"].get("region"))
+        box = self.frame.find(template_name, template)
         
         if box:
             center_x, center_y = self.detector.get_center(box)
             click_x = center_x + offset_x
             click_y = center_y + offset_y
-            click_at(click_x, click_y, self.config["actions"]["click_delay"])
+            self.click(click_x, click_y)
+            # The click may change the screen, so later checks need a new capture
+            self.frame.invalidate()
             print(f"Clicked on '{template_name}' at ({click_x}, {click_y})")
             return True
         
@@ -152,9 +363,18 @@ class RobloxMacro:
         scan_interval = self.config["detection"]["scan_interval"]
         region = self.config["detection"].get("region")
         
-        box = self.detector.wait_for_image(template, timeout, scan_interval, region)
+        box = self.detector.wait_for_image(template, timeout, scan_interval, region, stop_event=self.halted)
+        # The screen has moved on while waiting
+        self.frame.invalidate()
         
-        _check_roblox_running(self) -> bool:
+        if box:
+            print(f"Found '{template_name}'")
+            return True
+        else:
+            print(f"Timeout waiting for '{template_name}'")
+            return False
+    
+    def _check_roblox_running(self) -> bool:
         """
         Check if Roblox is currently running
         
@@ -216,13 +436,6 @@ class RobloxMacro:
             print(f"Error during initial sequence: {e}")
             self.initial_sequence_done = True  # Continue anyway
     
-    def if box:
-            print(f"Found '{template_name}'")
-            return True
-        else:
-            print(f"Timeout waiting for '{template_name}'")
-            return False
-    
     def image_exists(self, template_name: str) -> bool:
         """
         Check if an image exists on screen
@@ -237,7 +450,7 @@ class RobloxMacro:
             return False
         
         template = self.templates[template_name]
-        box = self.detector.find_image(template, self.config["detection"].get("region"))
+        box = self.frame.find(template_name, template)
         return box is not None
     
     def macro_logic(self):
@@ -255,12 +468,17 @@ class RobloxMacro:
         # - "reward": A reward to collect
         # - "close_button": A popup close button
         
+        if self.rules.rules:
+            # Rules from config.json replace the hand-written example below
+            self.rules.evaluate()
+            return
+        
         print("Running macro logic...")
         
         # Example 1: Click on a button if it exists
         if self.image_exists("play_button"):
             self.find_and_click("play_button")
-            time.sleep(1)
+            self.sleep(1)
         
         # Example 2: Wait for and click a reward
         if self.wait_for_image("reward", timeout=5):
@@ -276,32 +494,47 @@ class RobloxMacro:
         # - self.wait_for_image(template_name) to wait for an image
         # - self.image_exists(template_name) to check if image exists
         # - keyboard.press(key) to press keyboard keys
-        # - time.sleep(seconds) to add delays
+        #   (then call self.frame.invalidate() if the key changes the screen)
+        # - self.sleep(seconds) to add delays (ends early on pause/stop, unlike time.sleep)
+        # - self.check_halted() before sending input yourself (e.g. keyboard.press), so
+        #   a paused or stopped macro ends the tick instead of carrying on
+        #
+        # Checks within one tick share a single screen capture (self.frame);
+        # find_and_click and wait_for_image refresh it automatically.
     
     def run(self):
         """Main loop for the macro"""
         print("=== Roblox Image Detection Macro ===")
         print(f"Loaded {len(self.templates)} template(s)")
+        if self.rules.rules:
+            print(f"Loaded {len(self.rules.rules)} rule(s) from config")
         print(f"\nPress {self.config['hotkeys']['start'].upper()} to start")
         print(f"Press {self.config['hotkeys']['pause'].upper()} to pause")
         print(f"Press {self.config['hotkeys']['stop'].upper()} to stop")
         
         try:
             while True:
-                if self.running and not self.paused:
-                    try:
-                        self.macro_logic()
-                        time.sleep(self.config["detection"]["scan_interval"])
-                    except Exception as e:
-                        print(f"Error in macro logic: {e}")
-                        time.sleep(1)
-                else:
-                    time.sleep(0.1)
+                # Wakes as soon as the macro is started or resumed; the timeout only
+                # keeps Ctrl+C responsive (a bare Event.wait() blocks it on Windows)
+                if not self.active.wait(0.5):
+                    continue
+                try:
+                    # New tick: capture once, on the first check
+                    self.frame.invalidate()
+                    self.macro_logic()
+                    self.sleep(self.config["detection"]["scan_interval"])
+                except MacroHalted:
+                    # Paused or stopped mid-tick; wait for the next start/resume
+                    pass
+                except Exception as e:
+                    print(f"Error in macro logic: {e}")
+                    self.sleep(1)
         
         except KeyboardInterrupt:
             print("\n\nMacro interrupted by user")
         finally:
             print("Shutting down...")
+            self.input.close()
 
 
 def main():
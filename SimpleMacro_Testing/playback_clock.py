@@ -0,0 +1,115 @@
+"""
+Drift-free timing for macro playback
+Waits are scheduled at absolute deadlines, so time spent acting doesn't add up across steps,
+and end early when playback is stopped
+"""
+
+import sys
+import time
+import threading
+from typing import Optional
+
+# Seconds before a deadline at which waiting switches from sleeping to spinning. Timed
+# waits on Windows only end on the system timer tick (15.6 ms by default), so they can
+# overshoot by a whole tick there; elsewhere they are accurate to well under a millisecond
+SPIN_THRESHOLD = 0.016 if sys.platform == "win32" else 0.002
+# When playback falls further behind than this, it moves the schedule instead of catching up
+MAX_CATCH_UP = 0.05
+# Lateness below this (e.g. the few microseconds an input call takes before a zero delay) isn't counted
+LATE_TOLERANCE = 0.001
+
+
+def wait_until(deadline: float, spin: float = SPIN_THRESHOLD,
+               stop_event: Optional[threading.Event] = None) -> bool:
+    """
+    Wait until a time.perf_counter() deadline
+
+    Sleeps until shortly before the deadline (sleep can overshoot by a
+    timer tick), then spins for the rest.
+
+    Args:
+        deadline: time.perf_counter() value to wait for
+        spin: Seconds before the deadline to stop sleeping
+        stop_event: Event that ends the wait early as soon as it is set
+
+    Returns:
+        True if the deadline was reached, False if stop_event was set
+    """
+    remaining = deadline - time.perf_counter()
+    if remaining > spin:
+        if stop_event is None:
+            time.sleep(remaining - spin)
+        elif stop_event.wait(remaining - spin):
+            return False
+    while time.perf_counter() < deadline:
+        if stop_event is not None and stop_event.is_set():
+            return False
+        time.sleep(0)  # Yield to other threads while spinning
+    return True
+
+
+class PlaybackClock:
+    """
+    Schedules playback waits at absolute deadlines
+
+    Each wait ends a fixed time after the previous deadline, not after the
+    previous action finished, so the time input calls take is absorbed
+    instead of delaying everything after it. Time spent past a deadline is
+    recorded as lateness.
+    """
+
+    def __init__(self, spin: float = SPIN_THRESHOLD, max_catch_up: float = MAX_CATCH_UP,
+                 stop_event: Optional[threading.Event] = None):
+        """
+        Args:
+            spin: Seconds before each deadline to stop sleeping and spin
+            max_catch_up: Lateness above which the schedule restarts from now
+                (so a stall isn't followed by a burst of back-to-back actions)
+            stop_event: Event that interrupts waits as soon as it is set
+        """
+        self.spin = spin
+        self.stop_event = stop_event
+        self.max_catch_up = max_catch_up
+        self.deadline = time.perf_counter()
+        self.lateness = 0.0
+        self.worst = 0.0
+        self.late_waits = 0
+
+    def restart(self):
+        """Schedule the next wait from now (after steps of unpredictable length, like image searches)"""
+        self.deadline = time.perf_counter()
+
+    def wait(self, seconds: float) -> bool:
+        """
+        Wait until `seconds` after the previous deadline
+
+        Args:
+            seconds: Time from the previous deadline
+
+        Returns:
+            True when the wait is over, False if the stop event was set
+        """
+        self.deadline += seconds
+        late = time.perf_counter() - self.deadline
+        if late <= 0:
+            return wait_until(self.deadline, self.spin, self.stop_event)
+        if late >= LATE_TOLERANCE:
+            self.lateness += late
+            self.worst = max(self.worst, late)
+            self.late_waits += 1
+            if late > self.max_catch_up:
+                self.restart()
+        return self.stop_event is None or not self.stop_event.is_set()
+
+    def take_lateness(self) -> dict:
+        """
+        Return and reset the lateness recorded since the last call
+
+        Returns:
+            Dict with 'total' and 'worst' (seconds) and 'late_waits' (count)
+        """
+        stats = {"total": self.lateness, "worst": self.worst, "late_waits": self.late_waits}
+        self.lateness = 0.0
+        self.worst = 0.0
+        self.late_waits = 0
+        return stats
@@ -1,5 +1,6 @@
 import json
 import time
+import threading
 from datetime import datetime
 from pathlib import Path
 from pynput import mouse, keyboard
@@ -136,6 +137,11 @@ class InputPlayer:
         self.keyboard_controller = KeyboardController()
         self.playing = False
         self.paused = False
+        # Set by stop() and toggle_pause() so a wait in play() re-checks at once
+        self._wake = threading.Event()
+        # Keys and mouse buttons playback has pressed and not released yet
+        self._held_keys = set()
+        self._held_buttons = set()
     
     def play(self, events, speed=1.0):
         """
@@ -150,29 +156,24 @@ class InputPlayer:
             return
         
         self.playing = True
+        self._wake.clear()
         print(f"\n▶️  Playing back {len(events)} events at {speed}x speed...")
         
-        start_time = time.time()
+        start_time = time.perf_counter()
         
-        for i, event in enumerate(events):
-            if not self.playing:
-                print("Playback stopped.")
-                break
-            
-            # Wait for pauses
-            while self.paused and self.playing:
-                time.sleep(0.1)
-            
-            # Wait until the correct timestamp
-            target_time = event['timestamp'] / speed
-            current_time = time.time() - start_time
-            wait_time = target_time - current_time
-            
-            if wait_time > 0:
-                time.sleep(wait_time)
-            
-            # Execute the event
-            self._execute_event(event)
+        try:
+            for i, event in enumerate(events):
+                # Wait until the correct timestamp (and through any pause)
+                start_time = self._wait_until(start_time, event['timestamp'] / speed)
+                if start_time is None:
+                    print("Playback stopped.")
+                    break
+                
+                # Execute the event
+                self._execute_event(event)
+        finally:
+            # Never leave a key or button held down after playback
+            self._release_held()
         
         self.playing = False
         print("✅ Playback complete!")
@@ -180,15 +181,58 @@ class InputPlayer:
     def stop(self):
         """Stop playback"""
         self.playing = False
+        self._wake.set()
     
     def toggle_pause(self):
         """Toggle pause state"""
         self.paused = not self.paused
+        self._wake.set()
         if self.paused:
             print("⏸️  Playback paused")
         else:
             print("▶️  Playback resumed")
     
+    def _wait_until(self, start_time, offset):
+        """
+        Wait until `offset` seconds after start_time; stop and pause interrupt the wait
+        
+        Args:
+            start_time: time.perf_counter() value playback started at
+            offset: Seconds after start_time to wait for
+        
+        Returns:
+            The start time to use from now on (moved later by time spent paused), or None if stopped
+        """
+        while self.playing:
+            if self.paused:
+                paused_at = time.perf_counter()
+                self._wake.wait()
+                self._wake.clear()
+                start_time += time.perf_counter() - paused_at
+                continue
+            remaining = start_time + offset - time.perf_counter()
+            if remaining <= 0:
+                return start_time
+            if self._wake.wait(remaining):
+                # Woken by stop/pause; the loop re-checks both
+                self._wake.clear()
+        return None
+    
+    def _release_held(self):
+        """Release every key and mouse button playback left pressed"""
+        for key in list(self._held_keys):
+            try:
+                self.keyboard_controller.release(key)
+            except Exception as e:
+                print(f"Error releasing key: {e}")
+        for button in list(self._held_buttons):
+            try:
+                self.mouse_controller.release(button)
+            except Exception as e:
+                print(f"Error releasing mouse button: {e}")
+        self._held_keys.clear()
+        self._held_buttons.clear()
+    
     def _execute_event(self, event):
         """Execute a single event"""
         event_type = event['type']
@@ -211,8 +255,10 @@ class InputPlayer:
                 
                 if event['pressed']:
                     self.mouse_controller.press(button)
+                    self._held_buttons.add(button)
                 else:
                     self.mouse_controller.release(button)
+                    self._held_buttons.discard(button)
             
             elif event_type == 'mouse_scroll':
                 self.mouse_controller.scroll(event['dx'], event['dy'])
@@ -221,11 +267,13 @@ class InputPlayer:
                 key = self._parse_key(event['key'])
                 if key:
                     self.keyboard_controller.press(key)
+                    self._held_keys.add(key)
             
             elif event_type == 'key_release':
                 key = self._parse_key(event['key'])
                 if key:
                     self.keyboard_controller.release(key)
+                    self._held_keys.discard(key)
         
         except Exception as e:
             print(f"Error executing event: {e}")
@@ -350,7 +398,6 @@ class MacroRecorder:
             return
         
         # Play in a separate thread to not block hotkey detection
-        import threading
         playback_thread = threading.Thread(
             target=self.player.play,
             args=(self.current_recording, self.config['playback']['default_speed'])
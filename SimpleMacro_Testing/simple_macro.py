@@ -10,18 +10,85 @@ import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext, filedialog
 from pathlib import Path
 import threading
+import queue
 import sv_ttk
 import platform
 import ctypes
 from PIL import Image, ImageTk, ImageDraw
-import mss
-import cv2
 import numpy as np
 from pynput.keyboard import Controller as KeyboardController, Key, Listener as KeyboardListener
 from pynput.mouse import Controller as MouseController, Button, Listener as MouseListener
 import requests
 import io
 import hashlib
+try:
+    from image_utils import (template_cache, screen_capture, frame_bus, crop_region, bounding_region,
+                             match_in_frame, match_templates, ChangeDetector, PollPolicy, SearchHints,
+                             ScaleSearch, Frame)
+    from playback_clock import PlaybackClock
+except ImportError:
+    # Imported as SimpleMacro_Testing.simple_macro from the repository root
+    from SimpleMacro_Testing.image_utils import (template_cache, screen_capture, frame_bus, crop_region,
+                                                 bounding_region, match_in_frame, match_templates, ChangeDetector,
+                                                 PollPolicy, SearchHints, ScaleSearch, Frame)
+    from SimpleMacro_Testing.playback_clock import PlaybackClock
+
+
+# Named keys for click/hold steps; any other key must be a single character
+KEY_MAP = {
+    'enter': Key.enter,
+    'space': Key.space,
+    'tab': Key.tab,
+    'backspace': Key.backspace,
+    'delete': Key.delete,
+    'esc': Key.esc,
+    'escape': Key.esc,
+    'shift': Key.shift,
+    'ctrl': Key.ctrl,
+    'control': Key.ctrl,
+    'alt': Key.alt,
+    'cmd': Key.cmd,
+    'up': Key.up,
+    'down': Key.down,
+    'left': Key.left,
+    'right': Key.right,
+    'home': Key.home,
+    'end': Key.end,
+    'page_up': Key.page_up,
+    'pageup': Key.page_up,
+    'page_down': Key.page_down,
+    'pagedown': Key.page_down,
+}
+KEY_MAP.update({f'f{num}': getattr(Key, f'f{num}') for num in range(1, 13)})
+
+# How often the Tk loop shows status posted by worker threads (~30 Hz)
+STATUS_REFRESH_MS = 33
+
+# Mouse positions per second during drag steps (a step's 'drag_rate' overrides it)
+DRAG_RATE = 250
+
+
+class PlannedStep:
+    """A step with everything playback needs resolved up front (see SimpleMacroGUI._compile_steps)"""
+    
+    __slots__ = ('number', 'kind', 'step', 'iterations', 'once', 'speed', 'delay', 'position',
+                 'target', 'count', 'duration', 'settle', 'gap')
+    
+    def __init__(self, number, step, speed):
+        self.number = number  # 1-based position in the step list
+        self.kind = 'none'  # Which runner executes it
+        self.step = step  # The step dict itself (image searches read their options from it)
+        step_loop = step.get('step_loop', 1)
+        self.iterations = float('inf') if step_loop == 0 else step_loop
+        self.once = step_loop == 1  # "Run once only": first macro loop only
+        self.speed = speed  # Global speed * step speed
+        self.delay = step.get('delay', 0.1) / speed
+        self.position = (step['x'], step['y']) if 'x' in step and 'y' in step else None
+        self.target = None  # Button, key, text to type, scroll amount or drag path
+        self.count = 1  # Clicks/presses per run
+        self.duration = 0.0  # Hold time
+        self.settle = 0.1 / speed  # Pause after moving the mouse, before clicking
+        self.gap = 0.05 / speed  # Pause after each click/press (drags: between path points)
 
 
 class SimpleMacroGUI:
@@ -56,6 +123,16 @@ class SimpleMacroGUI:
         
         self.steps = []
         self.playing = False
+        # Set to stop playback; every playback wait wakes up on it (see stop_playback)
+        self._stop_event = threading.Event()
+        # Set when the app closes, ending the item detection thread
+        self._item_detector_stop = threading.Event()
+        
+        # Display scaling (1.0 = 100%); image steps record it so playback on a
+        # differently scaled screen knows which template size to try first
+        self.display_scale = self._detect_display_scale()
+        # Remembers the template scale that matched for the rest of the session
+        self.scale_search = ScaleSearch()
         
         # Save macros to user's Documents folder
         self.recordings_folder = Path.home() / "Documents"
@@ -98,6 +175,11 @@ class SimpleMacroGUI:
     Image Search Tips
     - Capture tight, clear samples of the target element. Test confidence values (start at 0.80) and adjust if needed.
     - Use a finite timeout (10–30s) for predictable behavior; 0 waits forever and may hang the macro.
+    - Set a Search Area (📐 Select Search Area) to capture and match only part of the screen; searches get much faster on large screens.
+    - Fast matching (coarse-to-fine) finds candidates on a downscaled screen and confirms them at full resolution; use it for large images or 4K screens.
+    - For icons with an uneven or changing background, save the sample as a PNG with the background erased (transparent); transparent pixels are ignored when matching, so confidence can stay high.
+    - Moving a macro to a screen with different display scaling (125%, 150%, ...)? Tick "Also search other sizes" on its Image Search steps. The sizes matching your display are tried first, and the size that worked is remembered until Simple Macro is closed.
+    - Colors: Grayscale (or a single color channel) matches about 3x faster than full color and is usually just as reliable for buttons and text; keep Full color when the target differs from its surroundings only by color.
 
     Drag & Reorder Steps
     - Reorder steps by selecting one or more items (Ctrl/Shift) and dragging them in the list.
@@ -268,12 +350,57 @@ class SimpleMacroGUI:
             padding=(10, 5)
         )
         self.status_label.pack(fill="x")
+        # Worker threads never call Tk themselves: they post status text and UI calls,
+        # and _drain_ui_queue applies them on the Tk thread
+        self._status_post = None
+        self._status_shown = None
+        self._ui_queue = queue.SimpleQueue()
+        self.root.after(STATUS_REFRESH_MS, self._drain_ui_queue)
         # Start global hotkey listener so F6/F7 work even when minimized
         try:
             self._start_hotkey_listener()
         except Exception:
             pass
     
+    @property
+    def stop_playback(self):
+        """True once playback has been asked to stop"""
+        return self._stop_event.is_set()
+    
+    @stop_playback.setter
+    def stop_playback(self, value):
+        if value:
+            self._stop_event.set()
+        else:
+            self._stop_event.clear()
+    
+    def _post_status(self, text):
+        """Set the status bar text from any thread; only the latest post is shown"""
+        # A new tuple per post, so posting the same text again still counts as an update
+        self._status_post = (text,)
+    
+    def _post_ui(self, func, *args):
+        """Run func(*args) on the Tk thread (for worker threads, e.g. to show a messagebox)"""
+        self._ui_queue.put((func, args))
+    
+    def _drain_ui_queue(self):
+        """Apply posted status text and UI calls; reschedules itself every STATUS_REFRESH_MS"""
+        # Reschedule first so a modal dialog opened below doesn't stall status updates
+        self.root.after(STATUS_REFRESH_MS, self._drain_ui_queue)
+        post = self._status_post
+        if post is not self._status_shown:
+            self._status_shown = post
+            self.status_label.config(text=post[0])
+        while True:
+            try:
+                func, args = self._ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"UI update error: {e}")
+    
     def _new_step_dialog(self):
         """Open dialog to create a new step"""
         dialog = tk.Toplevel(self.root)
@@ -630,8 +757,14 @@ class SimpleMacroGUI:
         ttk.Button(button_frame, text="Add Step", command=add_step).pack(side="left", padx=5)
         ttk.Button(button_frame, text="Cancel", command=cancel).pack(side="left", padx=5)
     
-    def _open_coordinate_picker(self, x_var, y_var, parent_dialog):
-        """Open a screenshot for coordinate picking with drawing"""
+    def _open_coordinate_picker(self, x_var, y_var, parent_dialog, region_var=None):
+        """Open a screenshot for coordinate picking with drawing
+
+        When `region_var` is given the picker selects a rectangle instead of a point:
+        left-drag draws the search area and Enter stores it in `region_var` as
+        'left, top, width, height' screen coordinates.
+        """
+        region_mode = region_var is not None
         # Release the grab from parent dialog so picker can receive input
         parent_dialog.grab_release()
         
@@ -641,14 +774,11 @@ class SimpleMacroGUI:
         time.sleep(0.3)  # Wait for windows to hide
         
         # Take screenshot and store monitor offset for coordinate conversion
-        with mss.mss() as sct:
-            # Use monitor[1] for primary monitor (monitor[0] is the combined virtual screen)
-            # This gives us proper coordinate mapping
-            monitor = sct.monitors[1]  # Primary monitor
-            self.monitor_offset_x = monitor['left']
-            self.monitor_offset_y = monitor['top']
-            screenshot = sct.grab(monitor)
-            img = Image.frombytes('RGB', screenshot.size, screenshot.bgra, 'raw', 'BGRX')
+        # (the capture service uses the primary monitor, not the combined virtual screen)
+        monitor = screen_capture.monitor()
+        self.monitor_offset_x = monitor['left']
+        self.monitor_offset_y = monitor['top']
+        img = screen_capture.grab_pil()
         
         # Create fullscreen picker window
         picker = tk.Toplevel()
@@ -660,6 +790,7 @@ class SimpleMacroGUI:
         self.drawing = False
         self.draw_start = None
         self.marked_coords = None
+        self.marked_region = None
         self.draw_items = []
         
         # Create canvas with screenshot
@@ -673,9 +804,13 @@ class SimpleMacroGUI:
         info_frame = tk.Frame(picker, bg="#2c3e50")
         info_frame.place(x=10, y=10)
         
+        if region_mode:
+            info_text = "📐 Left-click + Drag: Select search area  |  🖊️ Right-click + Drag: Draw  |  Enter: Confirm  |  Esc: Cancel"
+        else:
+            info_text = "🎯 Left-click: Set coordinates  |  🖊️ Right-click + Drag: Draw  |  Enter: Confirm  |  Esc: Cancel"
         info_label = tk.Label(
             info_frame,
-            text="🎯 Left-click: Set coordinates  |  🖊️ Right-click + Drag: Draw  |  Enter: Confirm  |  Esc: Cancel",
+            text=info_text,
             font=("Arial", 12, "bold"),
             bg="#2c3e50",
             fg="white",
@@ -700,6 +835,8 @@ class SimpleMacroGUI:
         h_line = None
         v_line = None
         marker = None
+        region_start = None
+        region_rect = None
         
         def on_mouse_move(event):
             nonlocal h_line, v_line
@@ -744,6 +881,38 @@ class SimpleMacroGUI:
                                   fill="#e74c3c", width=2)
             ]
         
+        def on_region_press(event):
+            nonlocal region_start, region_rect
+            region_start = (event.x, event.y)
+            if region_rect:
+                canvas.delete(region_rect)
+            region_rect = canvas.create_rectangle(event.x, event.y, event.x, event.y,
+                                                  outline="#e74c3c", width=2, dash=(6, 4))
+        
+        def on_region_drag(event):
+            on_mouse_move(event)
+            if region_start and region_rect:
+                canvas.coords(region_rect, region_start[0], region_start[1], event.x, event.y)
+        
+        def on_region_release(event):
+            nonlocal region_start
+            if not region_start:
+                return
+            x0, x1 = sorted((region_start[0], event.x))
+            y0, y1 = sorted((region_start[1], event.y))
+            region_start = None
+            if x1 - x0 < 2 or y1 - y0 < 2:
+                return  # Treat a plain click as no selection
+            
+            # Store the area in screen coordinates
+            self.marked_region = {
+                'left': x0 + self.monitor_offset_x,
+                'top': y0 + self.monitor_offset_y,
+                'width': x1 - x0,
+                'height': y1 - y0
+            }
+            coord_display.config(text=f"✓ Area: {self._format_region(self.marked_region)}")
+        
         def on_right_press(event):
             self.drawing = True
             self.draw_start = (event.x, event.y)
@@ -763,7 +932,10 @@ class SimpleMacroGUI:
             self.draw_start = None
         
         def confirm(event=None):
-            if self.marked_coords:
+            if region_mode:
+                if self.marked_region:
+                    region_var.set(self._format_region(self.marked_region))
+            elif self.marked_coords:
                 x_var.set(str(self.marked_coords[0]))
                 y_var.set(str(self.marked_coords[1]))
             picker.destroy()
@@ -784,7 +956,12 @@ class SimpleMacroGUI:
         
         # Bind mouse events to canvas
         canvas.bind("<Motion>", on_mouse_move)
-        canvas.bind("<Button-1>", on_left_click)
+        if region_mode:
+            canvas.bind("<Button-1>", on_region_press)
+            canvas.bind("<B1-Motion>", on_region_drag)
+            canvas.bind("<ButtonRelease-1>", on_region_release)
+        else:
+            canvas.bind("<Button-1>", on_left_click)
         canvas.bind("<Button-3>", on_right_press)
         canvas.bind("<B3-Motion>", on_right_drag)
         canvas.bind("<ButtonRelease-3>", on_right_release)
@@ -818,6 +995,38 @@ class SimpleMacroGUI:
         picker.lift()
         picker.after(100, lambda: canvas.focus_set())
     
+    def _detect_display_scale(self):
+        """Return the display scaling factor (1.0 = 100%, 1.5 = 150%, ...)"""
+        try:
+            if platform.system() == 'Windows':
+                try:
+                    # Windows 10 1607+; matches the system DPI awareness set above
+                    return ctypes.windll.user32.GetDpiForSystem() / 96.0
+                except Exception:
+                    pass
+            return self.root.winfo_fpixels('1i') / 96.0
+        except Exception:
+            return 1.0
+    
+    def _format_region(self, region):
+        """Format a search region dict as 'left, top, width, height' (empty string = whole screen)"""
+        if not region:
+            return ""
+        return f"{region['left']}, {region['top']}, {region['width']}, {region['height']}"
+    
+    def _parse_region(self, text):
+        """Parse 'left, top, width, height' into a search region dict.
+
+        Returns None for an empty string and raises ValueError for malformed input.
+        """
+        text = text.strip()
+        if not text:
+            return None
+        parts = [int(float(part)) for part in text.split(',')]
+        if len(parts) != 4 or parts[2] <= 0 or parts[3] <= 0:
+            raise ValueError("search area must be 'left, top, width, height' with a positive size")
+        return {'left': parts[0], 'top': parts[1], 'width': parts[2], 'height': parts[3]}
+    
     def _update_steps_display(self):
         """Update the steps listbox display"""
         self.steps_listbox.delete(0, tk.END)
@@ -857,7 +1066,9 @@ class SimpleMacroGUI:
                             click_text += f" (+{offset_x}, +{offset_y})"
                 timeout = step.get('search_timeout', 30)
                 timeout_text = f" ⏱{timeout}s" if timeout > 0 else " ⏱∞"
-                text = f"{i}. {name_prefix}WAIT Image '{step['image_name']}'{timeout_text}{click_text}{step_opts}  [Delay: {step['delay']}s]"
+                region = step.get('search_region')
+                region_text = f" in ({self._format_region(region)})" if region else ""
+                text = f"{i}. {name_prefix}WAIT Image '{step['image_name']}'{region_text}{timeout_text}{click_text}{step_opts}  [Delay: {step['delay']}s]"
             elif step['action'] == 'type':
                 # Truncate long text for display
                 typed_text = step.get('text', '')
@@ -1134,6 +1345,31 @@ class SimpleMacroGUI:
             conf_entry_var = tk.StringVar(value=f"{conf_var.get():.2f}")
             ttk.Entry(conf_row, textvariable=conf_entry_var, width=8).pack(side="left", padx=5)
 
+            # Matching mode
+            match_mode_edit_var = tk.StringVar(value=step.get('match_mode', 'exact'))
+            match_row = ttk.Frame(img_frame)
+            match_row.pack(fill="x", pady=5)
+            ttk.Label(match_row, text="Matching:").pack(side="left")
+            ttk.Radiobutton(match_row, text="Exact", variable=match_mode_edit_var, value="exact").pack(side="left", padx=5)
+            ttk.Radiobutton(match_row, text="Fast (coarse-to-fine)", variable=match_mode_edit_var, value="pyramid").pack(side="left")
+            ttk.Radiobutton(match_row, text="Parallel", variable=match_mode_edit_var, value="tiled").pack(side="left", padx=5)
+
+            # Color mode
+            color_mode_edit_var = tk.StringVar(value=step.get('color_mode', 'color'))
+            color_row = ttk.Frame(img_frame)
+            color_row.pack(fill="x", pady=5)
+            ttk.Label(color_row, text="Colors:").pack(side="left")
+            ttk.Radiobutton(color_row, text="Full color", variable=color_mode_edit_var, value="color").pack(side="left", padx=5)
+            ttk.Radiobutton(color_row, text="Grayscale", variable=color_mode_edit_var, value="gray").pack(side="left")
+            ttk.Radiobutton(color_row, text="Red", variable=color_mode_edit_var, value="red").pack(side="left", padx=5)
+            ttk.Radiobutton(color_row, text="Green", variable=color_mode_edit_var, value="green").pack(side="left")
+            ttk.Radiobutton(color_row, text="Blue", variable=color_mode_edit_var, value="blue").pack(side="left", padx=5)
+
+            # Scale search
+            scale_search_edit_var = tk.BooleanVar(value=step.get('scale_search', False))
+            ttk.Checkbutton(img_frame, text="Also search other sizes (display scaling changes)",
+                            variable=scale_search_edit_var).pack(anchor="w", pady=5)
+
             # Search timeout
             timeout_row = ttk.Frame(img_frame)
             timeout_row.pack(fill="x", pady=5)
@@ -1142,6 +1378,16 @@ class SimpleMacroGUI:
             ttk.Entry(timeout_row, textvariable=timeout_edit_var, width=8).pack(side="left", padx=5)
             ttk.Label(timeout_row, text="(0 = wait forever)", font=("Arial", 8)).pack(side="left")
 
+            # Adaptive poll interval
+            poll_row = ttk.Frame(img_frame)
+            poll_row.pack(fill="x", pady=5)
+            ttk.Label(poll_row, text="Poll interval (sec) min:").pack(side="left")
+            poll_min_edit_var = tk.StringVar(value=str(step.get('poll_min', 0.1)))
+            ttk.Entry(poll_row, textvariable=poll_min_edit_var, width=6).pack(side="left", padx=5)
+            ttk.Label(poll_row, text="max:").pack(side="left")
+            poll_max_edit_var = tk.StringVar(value=str(step.get('poll_max', 1.0)))
+            ttk.Entry(poll_row, textvariable=poll_max_edit_var, width=6).pack(side="left", padx=5)
+
             # On-timeout behavior
             on_timeout_var = tk.StringVar(value=step.get('on_timeout', 'move_on'))
             ttk.Label(img_frame, text="On timeout:", font=("Arial", 10)).pack(anchor="w", pady=(8,0))
@@ -1150,6 +1396,16 @@ class SimpleMacroGUI:
             ttk.Radiobutton(on_to_frame, text="Move on to next step", variable=on_timeout_var, value="move_on").pack(anchor="w")
             ttk.Radiobutton(on_to_frame, text="Retry search after timeout", variable=on_timeout_var, value="retry").pack(anchor="w")
 
+            # Search area
+            ttk.Label(img_frame, text="Search Area (left, top, width, height; empty = whole screen):", font=("Arial", 10)).pack(anchor="w", pady=(8,0))
+            region_edit_var = tk.StringVar(value=self._format_region(step.get('search_region')))
+            region_row = ttk.Frame(img_frame)
+            region_row.pack(fill="x", pady=2)
+            ttk.Entry(region_row, textvariable=region_edit_var, width=24).pack(side="left")
+            ttk.Button(region_row, text="📐 Select",
+                      command=lambda: self._open_coordinate_picker(None, None, dialog, region_var=region_edit_var)).pack(side="left", padx=5)
+            ttk.Button(region_row, text="Clear", command=lambda: region_edit_var.set("")).pack(side="left")
+
             # Click settings
             click_var = tk.BooleanVar(value=step.get('click_image', False))
             ttk.Checkbutton(img_frame, text="Click when found", variable=click_var).pack(anchor="w")
@@ -1247,8 +1503,17 @@ class SimpleMacroGUI:
                 elif action == 'image_search':
                     self.steps[index]['click_image'] = click_var.get()
                     self.steps[index]['confidence'] = float(conf_entry_var.get())
+                    self.steps[index]['match_mode'] = match_mode_edit_var.get()
+                    self.steps[index]['color_mode'] = color_mode_edit_var.get()
+                    self.steps[index]['scale_search'] = scale_search_edit_var.get()
                     self.steps[index]['search_timeout'] = float(timeout_edit_var.get())
                     self.steps[index]['on_timeout'] = on_timeout_var.get()
+                    poll_min = float(poll_min_edit_var.get())
+                    poll_max = float(poll_max_edit_var.get())
+                    PollPolicy(poll_min, poll_max)  # Raises ValueError for unusable intervals
+                    self.steps[index]['poll_min'] = poll_min
+                    self.steps[index]['poll_max'] = poll_max
+                    self.steps[index]['search_region'] = self._parse_region(region_edit_var.get())
                     try:
                         self.steps[index]['click_count'] = int(click_count_var.get())
                     except Exception:
@@ -1284,12 +1549,23 @@ class SimpleMacroGUI:
     
     def _stop_macro(self):
         """Stop the currently playing macro"""
-        if self.playing:
-            self.stop_playback = True
-            self.status_label.config(text="⏹️ Stopping...")
-        else:
+        if not self._request_stop():
             messagebox.showinfo("Info", "No macro is currently playing.")
     
+    def _request_stop(self):
+        """
+        Stop playback if a macro is playing; safe to call from any thread
+        
+        Returns:
+            True if playback was playing and has been told to stop
+        """
+        if not self.playing:
+            return False
+        # Wakes every playback wait at once; the status goes through the UI queue
+        self.stop_playback = True
+        self._post_status("⏹️ Stopping...")
+        return True
+    
     def _open_settings(self):
         """Open settings dialog for loop count, playback speed, and theme"""
         dialog = tk.Toplevel(self.root)
@@ -1594,6 +1870,7 @@ class SimpleMacroGUI:
             "- Drag Steps (Mouse Drag Actions): The New Step dialog supports a new 'Drag' action.\n"
             "  • Create precise drag actions by specifying start (X,Y), end (X,Y), and duration (seconds).\n+            "
             "  • Drag steps are played back as a smooth press->move->release over the specified duration.\n"
+            "  • The mouse moves 250 times per second during a drag. Add 'drag_rate' to a drag step to change that (125–1000 works well).\n"
             "\n"
             "- QuickRec Drag Recognition: QuickRec attempts to detect press->move->release sequences and converts them into a single 'drag' step.\n"
             "  • When you record a mouse press, move, then release, the recorder will create a Drag step with inferred start/end coordinates and duration.\n"
@@ -1800,7 +2077,8 @@ class SimpleMacroGUI:
             if not base.exists():
                 return None
             for p in base.rglob('*'):
-                if p.is_file():
+                # Skip the template scale caches kept next to the images
+                if p.is_file() and self.scale_search.index.CACHE_DIR not in p.parts:
                     try:
                         if self._compute_image_hash(p) == img_hash:
                             return p
@@ -1838,7 +2116,8 @@ class SimpleMacroGUI:
             for idx, item in enumerate(self.item_detection_items):
                 name = item.get('name', 'unnamed')
                 enabled = '✓' if item.get('enabled', True) else '✗'
-                lb.insert(tk.END, f"{idx+1}. {name} [{enabled}]")
+                area = ' 📐' if item.get('search_region') else ''
+                lb.insert(tk.END, f"{idx+1}. {name} [{enabled}]{area}")
 
         def add_item():
             pick = filedialog.askopenfilename(title='Select item image', filetypes=[('Image','*.png;*.jpg;*.bmp')])
@@ -1859,14 +2138,38 @@ class SimpleMacroGUI:
             ttk.Label(subdialog, text='Confidence (0.5-1.0):').pack(padx=10)
             conf_var = tk.DoubleVar(value=0.8)
             ttk.Entry(subdialog, textvariable=conf_var, width=10).pack(padx=10, pady=5)
+            ttk.Label(subdialog, text='Colors:').pack(padx=10)
+            color_mode_var = tk.StringVar(value='color')
+            color_row = ttk.Frame(subdialog)
+            color_row.pack(padx=10, pady=5)
+            ttk.Radiobutton(color_row, text='Full color', variable=color_mode_var, value='color').pack(side='left')
+            ttk.Radiobutton(color_row, text='Grayscale', variable=color_mode_var, value='gray').pack(side='left', padx=5)
+            ttk.Radiobutton(color_row, text='Red', variable=color_mode_var, value='red').pack(side='left')
+            ttk.Radiobutton(color_row, text='Green', variable=color_mode_var, value='green').pack(side='left', padx=5)
+            ttk.Radiobutton(color_row, text='Blue', variable=color_mode_var, value='blue').pack(side='left')
+            ttk.Label(subdialog, text='Search area (left, top, width, height; empty = whole screen):').pack(padx=10)
+            region_var = tk.StringVar(value='')
+            ttk.Entry(subdialog, textvariable=region_var, width=24).pack(padx=10, pady=5)
+            ttk.Button(
+                subdialog,
+                text='📐 Select Search Area',
+                command=lambda: self._open_coordinate_picker(None, None, subdialog, region_var=region_var)
+            ).pack(padx=10)
 
             def save_item():
+                try:
+                    search_region = self._parse_region(region_var.get())
+                except ValueError as e:
+                    messagebox.showerror('Error', f'Invalid search area: {e}', parent=subdialog)
+                    return
                 image_hash = self._compute_image_hash(dest)
                 self.item_detection_items.append({
                     'image_path': str(dest),
                     'image_hash': image_hash,
                     'name': name_var.get().strip() or src.stem,
                     'confidence': float(conf_var.get()),
+                    'color_mode': color_mode_var.get(),
+                    'search_region': search_region,
                     'enabled': True,
                     'last_detected': 0,
                     'cooldown': 10
@@ -1933,16 +2236,21 @@ class SimpleMacroGUI:
         if not self.discord_webhook_url or not self.discord_webhook_enabled:
             return
 
+        # Take the screenshot on the calling (playback) thread so it matches the moment the
+        # loop completed; the frame bus hands out a frame another watcher just captured if
+        # there is one
+        try:
+            with frame_bus.subscribe(max_age=0.05) as frames:
+                frame = frames.get()
+            if frame is None:
+                raise RuntimeError("no screen frame available")
+            img = frame.to_pil()
+        except Exception as e:
+            print(f"Discord webhook notify error: {e}")
+            return
+
         def _do_notify():
             try:
-                # Take a screenshot of the primary monitor
-                with mss.mss() as sct:
-                    monitor = sct.monitors[1]
-                    sct_img = sct.grab(monitor)
-
-                # Convert to PIL Image
-                img = Image.frombytes('RGB', sct_img.size, sct_img.bgra, 'raw', 'BGRX')
-
                 # Save to bytes
                 bio = io.BytesIO()
                 img.save(bio, format='PNG')
@@ -2019,39 +2327,101 @@ class SimpleMacroGUI:
     def _start_item_detector(self):
         """Start the background item detection thread."""
         def _loop():
-            while True:
-                try:
-                    # small pause between cycles
-                    time.sleep(1.0)
-
-                    # iterate configured items
-                    for item in list(self.item_detection_items):
-                        try:
-                            if not item.get('enabled', True):
+            # Frames come from the shared frame bus; anything captured in the last half
+            # second (e.g. by a running image search) is recent enough for item detection.
+            # Subscribed only while items are enabled, for just the areas they search
+            frames = None
+            # Items whose search area is unchanged since their last miss are not re-matched
+            changes = ChangeDetector()
+            hints = SearchHints()
+            try:
+                # small pause between cycles, until the app closes
+                while not self._item_detector_stop.wait(1.0):
+                    try:
+                        # Build one match job per enabled item
+                        items = list(self.item_detection_items)
+                        jobs = {}
+                        for idx, item in enumerate(items):
+                            if not item.get('enabled', True) or not item.get('image_path'):
                                 continue
-
-                            confidence = item.get('confidence', 0.8)
-                            image_path = item.get('image_path')
-                            if not image_path:
+                            color_mode = item.get('color_mode', 'color')
+                            loaded = template_cache.get_masked(item['image_path'], color_mode)
+                            if loaded is None:
                                 continue
-
-                            res = self._search_for_image(image_path, confidence)
-                            if res:
-                                now = time.time()
-                                last = item.get('last_detected', 0)
-                                cooldown = item.get('cooldown', 10)
-                                if now - last >= cooldown:
-                                    # capture screenshot and send webhook
-                                    with mss.mss() as sct:
-                                        monitor = sct.monitors[1]
-                                        sct_img = sct.grab(monitor)
-                                    pil_img = Image.frombytes('RGB', sct_img.size, sct_img.bgra, 'raw', 'BGRX')
-                                    self._send_item_webhook(item.get('name', 'item'), pil_img)
-                                    item['last_detected'] = now
-                        except Exception:
-                            pass
-                except Exception:
-                    pass
+                            template, mask = loaded
+                            # Items sharing a color mode share one converted frame
+                            jobs[idx] = {
+                                'template': template,
+                                'mask': mask,
+                                'threshold': item.get('confidence', 0.8),
+                                'mode': item.get('match_mode', 'exact'),
+                                'color_mode': color_mode,
+                                'region': item.get('search_region')
+                            }
+                        if not jobs:
+                            # Nothing to watch; don't keep the bus capturing for us
+                            if frames is not None:
+                                frames.close()
+                                frames = None
+                            continue
+
+                        # Capture only the items' search areas (the whole monitor if any item has none),
+                        # so playback's own search areas stay small captures too
+                        region = bounding_region([job['region'] for job in jobs.values()])
+                        if frames is None:
+                            frames = frame_bus.subscribe(max_age=0.5, region=region)
+                        else:
+                            frames.region = region
+
+                        # One frame per cycle, shared by every item's template. Matching and the
+                        # webhook screenshot both use this private copy, so they always agree
+                        # whatever the bus captures for playback meanwhile
+                        frame_data = frames.get()
+                        if frame_data is None:
+                            continue
+                        frame_data = Frame(frame_data.image.copy(), frame_data.timestamp, frame_data.origin,
+                                           frame_data.seq, frame_data.full_monitor)
+                        frame = frame_data.image
+                        keys = {}
+                        for idx, job in list(jobs.items()):
+                            keys[idx] = (id(items[idx]), items[idx]['image_path'], job['threshold'])
+                            area = crop_region(frame, frame_data.origin, job['region'])
+                            if area is not None and not changes.should_match(keys[idx], area[0]):
+                                del jobs[idx]
+                                continue
+                            job['hint'] = hints.window(keys[idx])
+                        results = match_templates(frame, jobs, frame_data.origin)
+
+                        pil_img = None
+                        for idx, res in results.items():
+                            try:
+                                item = items[idx]
+                                found = bool(res and res[0] >= jobs[idx]['threshold'])
+                                changes.record_result(keys[idx], found)
+                                if res:
+                                    hints.record(keys[idx], res[1] if found else None, res[2])
+                                # Keep the latest score and hint hit rate on the item so they can be inspected/tuned
+                                item['last_score'] = res[0] if res else None
+                                item['hint_hit_rate'] = hints.hit_rate(keys[idx])
+                                if res and res[0] >= jobs[idx]['threshold']:
+                                    now = time.time()
+                                    last = item.get('last_detected', 0)
+                                    cooldown = item.get('cooldown', 10)
+                                    if now - last >= cooldown:
+                                        # Send the frame the item was detected in
+                                        if pil_img is None:
+                                            pil_img = frame_data.to_pil()
+                                        self._send_item_webhook(item.get('name', 'item'), pil_img)
+                                        item['last_detected'] = now
+                            except Exception:
+                                pass
+                    except Exception:
+                        pass
+            finally:
+                if frames is not None:
+                    frames.close()
+                # Release this thread's display connection if it ever captured directly
+                screen_capture.close_thread()
 
         t = threading.Thread(target=_loop, daemon=True)
         t.start()
@@ -2151,6 +2521,43 @@ class SimpleMacroGUI:
                                orient="horizontal", command=update_conf_label)
         conf_slider.pack(fill="x")
         
+        ttk.Label(conf_frame, text="Matching:", font=("Arial", 10)).pack(anchor="w", pady=(8, 0))
+        match_mode_var = tk.StringVar(value="exact")
+        ttk.Radiobutton(conf_frame, text="Exact (full resolution)", variable=match_mode_var, value="exact").pack(anchor="w")
+        ttk.Radiobutton(conf_frame, text="Fast (coarse-to-fine, for large screens/images)", variable=match_mode_var, value="pyramid").pack(anchor="w")
+        ttk.Radiobutton(conf_frame, text="Parallel (split across CPU cores)", variable=match_mode_var, value="tiled").pack(anchor="w")
+        
+        ttk.Label(conf_frame, text="Colors:", font=("Arial", 10)).pack(anchor="w", pady=(8, 0))
+        color_mode_var = tk.StringVar(value="color")
+        ttk.Radiobutton(conf_frame, text="Full color", variable=color_mode_var, value="color").pack(anchor="w")
+        ttk.Radiobutton(conf_frame, text="Grayscale (about 3x faster)", variable=color_mode_var, value="gray").pack(anchor="w")
+        color_channel_row = ttk.Frame(conf_frame)
+        color_channel_row.pack(anchor="w")
+        ttk.Label(color_channel_row, text="Single channel:").pack(side="left")
+        ttk.Radiobutton(color_channel_row, text="Red", variable=color_mode_var, value="red").pack(side="left", padx=5)
+        ttk.Radiobutton(color_channel_row, text="Green", variable=color_mode_var, value="green").pack(side="left")
+        ttk.Radiobutton(color_channel_row, text="Blue", variable=color_mode_var, value="blue").pack(side="left", padx=5)
+        
+        scale_search_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(conf_frame, text="Also search other sizes (for screens with different display scaling)",
+                        variable=scale_search_var).pack(anchor="w", pady=(8, 0))
+        
+        # Search area (only this part of the screen is captured and matched)
+        region_frame = ttk.LabelFrame(frame, text="Search Area", padding=10)
+        region_frame.pack(fill="x", pady=10)
+        
+        ttk.Label(region_frame, text="left, top, width, height (empty = whole screen)", font=("Arial", 8)).pack(anchor="w")
+        region_var = tk.StringVar(value="")
+        region_row = ttk.Frame(region_frame)
+        region_row.pack(fill="x", pady=5)
+        ttk.Entry(region_row, textvariable=region_var, width=24).pack(side="left")
+        ttk.Button(region_row, text="Clear", command=lambda: region_var.set("")).pack(side="left", padx=5)
+        ttk.Button(
+            region_frame,
+            text="📐 Select Search Area",
+            command=lambda: self._open_coordinate_picker(None, None, dialog, region_var=region_var)
+        ).pack(anchor="w", pady=5)
+        
         # Click on image option
         click_frame = ttk.LabelFrame(frame, text="Click Action", padding=10)
         click_frame.pack(fill="x", pady=10)
@@ -2242,6 +2649,17 @@ class SimpleMacroGUI:
         ttk.Radiobutton(on_to_frame, text="Move on to next step", variable=on_timeout_var, value="move_on").pack(anchor="w")
         ttk.Radiobutton(on_to_frame, text="Retry search after timeout", variable=on_timeout_var, value="retry").pack(anchor="w")
         
+        # Poll interval (adaptive: starts at min, backs off to max while the screen is static)
+        ttk.Label(timeout_frame, text="Poll interval (seconds):", font=("Arial", 10)).pack(anchor="w", pady=(8,0))
+        poll_row = ttk.Frame(timeout_frame)
+        poll_row.pack(fill="x", pady=2)
+        ttk.Label(poll_row, text="Min:").pack(side="left")
+        poll_min_var = tk.StringVar(value="0.1")
+        ttk.Entry(poll_row, textvariable=poll_min_var, width=6).pack(side="left", padx=5)
+        ttk.Label(poll_row, text="Max:").pack(side="left", padx=(10, 0))
+        poll_max_var = tk.StringVar(value="1.0")
+        ttk.Entry(poll_row, textvariable=poll_max_var, width=6).pack(side="left", padx=5)
+        
         # Delay
         delay_frame = ttk.Frame(frame)
         delay_frame.pack(fill="x", pady=10)
@@ -2268,12 +2686,34 @@ class SimpleMacroGUI:
                 messagebox.showerror("Error", "Timeout must be a number!")
                 return
             
+            try:
+                search_region = self._parse_region(region_var.get())
+            except ValueError as e:
+                messagebox.showerror("Error", f"Invalid search area: {e}")
+                return
+            
+            try:
+                poll_min = float(poll_min_var.get())
+                poll_max = float(poll_max_var.get())
+            except ValueError:
+                messagebox.showerror("Error", "Poll intervals must be numbers!")
+                return
+            try:
+                PollPolicy(poll_min, poll_max)
+            except ValueError as e:
+                messagebox.showerror("Error", str(e))
+                return
+            
             step = {
                 'action': 'image_search',
                 'image_path': image_path_var.get(),
                 'image_name': image_name_var.get(),
                 'image_hash': None,
                 'confidence': conf_var.get(),
+                'match_mode': match_mode_var.get(),
+                'color_mode': color_mode_var.get(),
+                'scale_search': scale_search_var.get(),
+                'recorded_scale': self.display_scale,
                 'click_image': click_image_var.get(),
                 'click_count': click_count_var.get(),
                 'click_mode': click_mode_var.get(),
@@ -2282,6 +2722,9 @@ class SimpleMacroGUI:
                 'delay': delay,
                 'search_timeout': search_timeout,
                 'on_timeout': on_timeout_var.get(),
+                'poll_min': poll_min,
+                'poll_max': poll_max,
+                'search_region': search_region,
                 'name': step_name_var.get().strip()
             }
             
@@ -2311,36 +2754,87 @@ class SimpleMacroGUI:
         ttk.Button(button_frame, text="Add Step", command=add_step).pack(side="left", padx=5)
         ttk.Button(button_frame, text="Cancel", command=dialog.destroy).pack(side="left", padx=5)
     
-    def _search_for_image(self, image_path, confidence=0.8):
-        """Search for an image on screen and return center coordinates if found"""
+    def _search_for_image(self, image_path, confidence=0.8, region=None, match_mode='exact', color_mode='color',
+                          frames=None, changes=None, hints=None, search_key=None, likely_scale=None):
+        """Search for an image on screen and return center coordinates if found
+
+        `region` is an optional search area dict ('left', 'top', 'width', 'height' in
+        screen coordinates); only that area is captured and matched. The returned
+        center is always in screen coordinates. `match_mode` is 'exact', 'pyramid'
+        (coarse-to-fine) or 'tiled' (multi-core), see image_utils.match_template.
+        `color_mode` is 'color', 'gray' or a single channel ('red', 'green', 'blue');
+        the template is converted once when loaded and each frame once per mode.
+        Transparent pixels of PNG templates (alpha < 128) are ignored when matching.
+
+        With `likely_scale` set, the template is also searched at other sizes
+        (image_utils.ScaleSearch), starting with the scale that matched last time
+        and then the one expected from the display scaling. The returned tuple is
+        (center_x, center_y, confidence, scale of the match).
+
+        Optional per-run helpers, all keyed by `search_key`:
+        - `frames`: frame bus subscription; the frame comes from the shared capture
+          thread instead of a capture of our own
+        - `changes`: ChangeDetector; the match is skipped (None returned) while the
+          search area is unchanged since the last miss
+        - `hints`: SearchHints; a small window around the last hit is tried before
+          the whole search area
+        """
         try:
-            # Take screenshot
-            with mss.mss() as sct:
-                # Prefer primary monitor if available, otherwise fall back to the first available
-                try:
-                    monitor = sct.monitors[1]
-                except Exception:
-                    # Some environments may only expose monitors[0]
-                    monitor = sct.monitors[0]
-                screenshot = sct.grab(monitor)
-                screen_img = np.array(screenshot)
-                screen_img = cv2.cvtColor(screen_img, cv2.COLOR_BGRA2BGR)
-            
-            # Load template
-            template = cv2.imread(image_path)
-            if template is None:
+            # Load template and its alpha mask (decoded once, then served from the shared cache)
+            loaded = template_cache.get_masked(image_path, color_mode)
+            if loaded is None:
+                return None
+            template, mask = loaded
+            
+            if frames is not None:
+                frames.region = region or None
+                frame = frames.get()
+                if frame is None:
+                    return None
+                # The crop keeps the frame's pooled buffer from being reused (see BufferPool),
+                # so it can't change while it is matched
+                area = crop_region(frame.converted(color_mode), frame.origin, region)
+                if area is None:
+                    return None
+                screen_img, origin = area
+            else:
+                # Take screenshot with this thread's persistent grabber
+                # (primary monitor, falling back to monitors[0] where that's all there is)
+                area = region if region else screen_capture.monitor()
+                origin = (area['left'], area['top'])
+                screen_img = screen_capture.grab(region or None, color_mode=color_mode)
+            
+            h, w = template.shape[:2]
+            if likely_scale is None and (screen_img.shape[0] < h or screen_img.shape[1] < w):
+                # Search area is smaller than the template; it can never match
                 return None
             
-            # Template matching
-            result = cv2.matchTemplate(screen_img, template, cv2.TM_CCOEFF_NORMED)
-            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+            if changes is not None and not changes.should_match(search_key, screen_img):
+                # Nothing changed since the last miss, so the result would be the same
+                return None
             
-            if max_val >= confidence:
-                # Calculate center of found image
-                h, w = template.shape[:2]
-                center_x = max_loc[0] + w // 2
-                center_y = max_loc[1] + h // 2
-                return (center_x, center_y, max_val)
+            # Template matching (hint window first, then the whole search area)
+            hint = hints.window(search_key) if hints is not None else None
+            scale = 1.0
+            if likely_scale is not None:
+                result = self.scale_search.match(screen_img, origin, image_path, confidence, match_mode, color_mode,
+                                                 hint=hint, key=search_key, likely_scale=likely_scale)
+                if result is None:
+                    # Search area is smaller than the template at every scale
+                    return None
+                max_val, (x, y, w, h), from_hint, scale = result
+            else:
+                max_val, (x, y, w, h), from_hint = match_in_frame(screen_img, origin, template, confidence,
+                                                                  match_mode, hint=hint, mask=mask)
+            found = max_val >= confidence
+            if changes is not None:
+                changes.record_result(search_key, found)
+            if hints is not None:
+                hints.record(search_key, (x, y, w, h) if found else None, from_hint)
+            
+            if found:
+                # Center of found image, already translated back to screen space
+                return (x + w // 2, y + h // 2, max_val, scale)
             
             return None
         except Exception as e:
@@ -2981,199 +3475,78 @@ class SimpleMacroGUI:
         """Execute the macro steps with looping and speed control"""
         self.playing = True
         self.stop_playback = False
+        session = None
         
-        # Determine number of loops (0 = infinite)
-        loops_remaining = self.loop_count if self.loop_count > 0 else float('inf')
-        current_loop = 0
-        
-        # Track which steps have been executed (for "run once only" steps with step_loop=1)
-        # Steps with step_loop=1 only run once per playback session
-        executed_once_only_steps = set()
-        
+        # Everything after this point is inside the try, so the finally below always
+        # resets the playing/stop state, even if setting up playback fails
         try:
+            # Determine number of loops (0 = infinite)
+            loops_remaining = self.loop_count if self.loop_count > 0 else float('inf')
+            current_loop = 0
+            
+            runners = {
+                'image_search': self._run_image_search_step,
+                'type': self._run_type_step,
+                'scroll': self._run_scroll_step,
+                'mouse_click': self._run_mouse_click_step,
+                'mouse_hold': self._run_mouse_hold_step,
+                'mouse_move': self._run_mouse_move_step,
+                'key_click': self._run_key_click_step,
+                'key_hold': self._run_key_hold_step,
+                'drag': self._run_drag_step,
+                'none': lambda planned, session: True,
+            }
+            
+            # Image searches read frames from the shared capture thread (at most 50 ms old)
+            # and skip matching while their search area stays unchanged after a miss.
+            # Each step first looks where it found its image last time.
+            # Waits are scheduled on one clock, so the time actions take doesn't drift the macro
+            # Stopping interrupts any wait within milliseconds
+            session = {'frames': frame_bus.subscribe(max_age=0.05), 'changes': ChangeDetector(), 'hints': SearchHints(),
+                       'clock': PlaybackClock(stop_event=self._stop_event)}
+            self.loop_lateness = []
+            
+            # Resolve every step once; later loops skip the "run once only" steps
+            plan = self._compile_steps(self.steps)
+            repeat_plan = [planned for planned in plan if not planned.once]
+            session['clock'].restart()
+            
             while loops_remaining > 0 and not self.stop_playback:
                 current_loop += 1
                 loop_text = f"(Loop {current_loop}" + (f"/{self.loop_count})" if self.loop_count > 0 else "/∞)")
                 
-                for i, step in enumerate(self.steps, 1):
+                for planned in (plan if current_loop == 1 else repeat_plan):
                     # Check for stop signal
                     if self.stop_playback:
-                        self.status_label.config(text="⏹️ Macro stopped by user")
                         return
                     
-                    # Get per-step options
-                    step_speed = step.get('step_speed', 1.0)
-                    step_loop = step.get('step_loop', 1)
-                    
-                    # Skip "run once only" steps that have already been executed
-                    if step_loop == 1 and i in executed_once_only_steps:
-                        continue
-                    
-                    # Mark step as executed if it's a "run once only" step
-                    if step_loop == 1:
-                        executed_once_only_steps.add(i)
-                    
-                    # Calculate effective speed (global * step multiplier)
-                    effective_speed = self.playback_speed * step_speed
-                    
-                    # Determine loop count for this step (0 = infinite within this macro loop)
-                    if step_loop == 0:
-                        step_iterations = float('inf')
-                    else:
-                        step_iterations = step_loop
+                    run = runners[planned.kind]
                     
                     # Loop this step if needed
                     step_iter_count = 0
-                    while step_iter_count < step_iterations:
+                    while step_iter_count < planned.iterations:
                         if self.stop_playback:
                             return
                         
                         step_iter_count += 1
                         
-                        if step_loop == 0:
+                        if planned.iterations == float('inf'):
                             step_loop_text = f" [∞ iter {step_iter_count}]"
-                        elif step_loop > 1:
-                            step_loop_text = f" [{step_iter_count}/{step_loop}]"
+                        elif planned.iterations > 1:
+                            step_loop_text = f" [{step_iter_count}/{planned.iterations}]"
                         else:
                             step_loop_text = ""
                         
-                        self.status_label.config(text=f"▶️ Step {i}/{len(self.steps)}{step_loop_text} {loop_text} @ {effective_speed:.1f}x")
-                        
-                        action = step['action']
-                        delay = step.get('delay', 0.1)
+                        self._post_status(f"▶️ Step {planned.number}/{len(plan)}{step_loop_text} {loop_text} @ {planned.speed:.1f}x")
                         
-                        # Handle image search step (with wait and timeout)
-                        if action == 'image_search':
-                            image_path = step.get('image_path', '')
-                            confidence = step.get('confidence', 0.8)
-                            click_image = step.get('click_image', False)
-                            click_mode = step.get('click_mode', 'offset')
-                            search_timeout = step.get('search_timeout', 30)  # Default 30 seconds
-                            
-                            # Wait for image to be found (with timeout)
-                            start_time = time.time()
-                            result = None
-                            search_attempt = 0
-                            
-                            while result is None and not self.stop_playback:
-                                search_attempt += 1
-                                elapsed = time.time() - start_time
-                                
-                                # Check timeout (0 = no timeout, wait forever)
-                                if search_timeout > 0 and elapsed >= search_timeout:
-                                    # Decide whether to retry or move on based on step setting
-                                    on_timeout = step.get('on_timeout', 'move_on')
-                                    if on_timeout == 'retry':
-                                        # restart the timer and try again
-                                        start_time = time.time()
-                                        # small pause to avoid tight loop
-                                        time.sleep(0.2)
-                                        continue
-                                    else:
-                                        self.status_label.config(text=f"⏱️ Timeout: Image not found after {search_timeout}s")
-                                        break
-                                
-                                # Update status with search progress
-                                if search_timeout > 0:
-                                    self.status_label.config(text=f"🔍 Searching for image... ({elapsed:.1f}s / {search_timeout}s)")
-                                else:
-                                    self.status_label.config(text=f"🔍 Searching for image... ({elapsed:.1f}s)")
-                                
-                                result = self._search_for_image(image_path, confidence)
-                                
-                                if result is None:
-                                    time.sleep(0.2)  # Wait a bit before retrying
-                            
-                            if result:
-                                center_x, center_y, conf = result
-                                
-                                if click_image:
-                                    # Determine click coordinates based on mode
-                                    if click_mode == 'absolute' and 'abs_x' in step:
-                                        click_x = step['abs_x']
-                                        click_y = step['abs_y']
-                                    else:
-                                        # Offset mode - click relative to image center
-                                        offset_x = step.get('offset_x', 0)
-                                        offset_y = step.get('offset_y', 0)
-                                        click_x = center_x + offset_x
-                                        click_y = center_y + offset_y
-
-                                    click_count = step.get('click_count', 1)
-                                    for _ in range(int(click_count)):
-                                        self.mouse_controller.position = (click_x, click_y)
-                                        time.sleep(0.1 / effective_speed)
-                                        self.mouse_controller.click(Button.left)
-                            # If image not found after timeout, continue to next step
-                            # (Status already updated in the search loop)
-                        
-                        elif action == 'type':
-                            # Type text using keyboard controller
-                            text_to_type = step.get('text', '')
-                            if text_to_type:
-                                self.keyboard_controller.type(text_to_type)
-                        
-                        elif action == 'scroll':
-                            # Scroll the mouse wheel
-                            scroll_amount = step.get('scroll_amount', 0)
-                            
-                            # Move to coordinates if specified
-                            if 'x' in step and 'y' in step:
-                                self.mouse_controller.position = (step['x'], step['y'])
-                                time.sleep(0.05 / effective_speed)
-                            
-                            # Perform the scroll
-                            self.mouse_controller.scroll(0, scroll_amount)
-                        
-                        else:
-                            # Regular click/hold step
-                            key = step.get('key', '').lower()
-                            amount = step.get('amount', 1)
-                            
-                            # Execute the action
-                            if 'click' in key:  # Mouse click
-                                button = Button.left if 'left' in key else Button.right
-                                
-                                # Move to coordinates if specified
-                                if 'x' in step and 'y' in step:
-                                    self.mouse_controller.position = (step['x'], step['y'])
-                                    time.sleep(0.1 / effective_speed)
-                                
-                                if action == 'click':
-                                    for _ in range(int(amount)):
-                                        if self.stop_playback:
-                                            return
-                                        self.mouse_controller.click(button)
-                                        time.sleep(0.05 / effective_speed)
-                                else:  # hold
-                                    self.mouse_controller.press(button)
-                                    time.sleep(amount / effective_speed)
-                                    self.mouse_controller.release(button)
-                            
-                            elif key == 'mouse_move':
-                                # Just move mouse, no click
-                                if 'x' in step and 'y' in step:
-                                    self.mouse_controller.position = (step['x'], step['y'])
-                            
-                            else:  # Keyboard key
-                                parsed_key = self._parse_key(key)
-                                
-                                if parsed_key:
-                                    if action == 'click':
-                                        for _ in range(int(amount)):
-                                            if self.stop_playback:
-                                                return
-                                            self.keyboard_controller.press(parsed_key)
-                                            self.keyboard_controller.release(parsed_key)
-                                            time.sleep(0.05 / effective_speed)
-                                    else:  # hold
-                                        self.keyboard_controller.press(parsed_key)
-                                        time.sleep(amount / effective_speed)
-                                        self.keyboard_controller.release(parsed_key)
+                        if not run(planned, session):
+                            return
                         
                         # Delay after step (adjusted by effective speed)
-                        adjusted_delay = delay / effective_speed
-                        time.sleep(adjusted_delay)
+                        if not session['clock'].wait(planned.delay):
+                            return
+                
+                self._report_loop_lateness(current_loop, session['clock'].take_lateness())
                 
                 # After completing one full macro loop, send a Discord webhook notification if enabled.
                 try:
@@ -3184,53 +3557,269 @@ class SimpleMacroGUI:
                 loops_remaining -= 1
             
             if not self.stop_playback:
-                self.status_label.config(text=f"✅ Macro completed! ({current_loop} loop(s))")
+                self._post_status(f"✅ Macro completed! ({current_loop} loop(s))")
         
         except Exception as e:
-            self.status_label.config(text=f"❌ Error: {str(e)}")
-            messagebox.showerror("Error", f"Error executing macro:\n{str(e)}")
+            self._post_status(f"❌ Error: {str(e)}")
+            self._post_ui(messagebox.showerror, "Error", f"Error executing macro:\n{str(e)}")
         
         finally:
+            if self.stop_playback:
+                self._post_status("⏹️ Macro stopped by user")
+            if session is not None:
+                session['frames'].close()
+                self._report_search_hints(session['hints'])
+            # Searches that bypass the frame bus opened a grabber on this thread
+            screen_capture.close_thread()
             self.playing = False
             self.stop_playback = False
     
-    def _parse_key(self, key_str):
-        """Parse key string to pynput key"""
-        key_map = {
-            'enter': Key.enter,
-            'space': Key.space,
-            'tab': Key.tab,
-            'backspace': Key.backspace,
-            'delete': Key.delete,
-            'esc': Key.esc,
-            'escape': Key.esc,
-            'shift': Key.shift,
-            'ctrl': Key.ctrl,
-            'control': Key.ctrl,
-            'alt': Key.alt,
-            'cmd': Key.cmd,
-            'up': Key.up,
-            'down': Key.down,
-            'left': Key.left,
-            'right': Key.right,
-            'home': Key.home,
-            'end': Key.end,
-            'page_up': Key.page_up,
-            'pageup': Key.page_up,
-            'page_down': Key.page_down,
-            'pagedown': Key.page_down,
-        }
+    def _report_search_hints(self, hints):
+        """Keep and print per-step hit rates of the last-known-location hints"""
+        self.search_hint_stats = {key[0]: stat for key, stat in hints.stats().items()}
+        for step_number, stat in sorted(self.search_hint_stats.items()):
+            if stat['hit_rate'] is None:
+                print(f"Image search step {step_number}: not on screen in {stat['absent']} hinted searches")
+                continue
+            print(f"Image search step {step_number}: found near last location in "
+                  f"{stat['hits']}/{stat['hits'] + stat['misses']} searches ({stat['hit_rate']:.0%}), "
+                  f"not on screen in {stat['absent']}")
+    
+    def _report_loop_lateness(self, loop_number, lateness):
+        """Keep and print how far one macro loop fell behind its schedule"""
+        self.loop_lateness.append(lateness)
+        if lateness['late_waits']:
+            print(f"Loop {loop_number}: {lateness['total'] * 1000:.1f} ms behind schedule over "
+                  f"{lateness['late_waits']} wait(s) (worst {lateness['worst'] * 1000:.1f} ms)")
+    
+    def _compile_steps(self, steps):
+        """
+        Resolve steps for playback: runner, pynput button/key and speed-adjusted timings
         
-        # Check for function keys
-        if key_str.startswith('f') and len(key_str) <= 3:
-            try:
-                num = int(key_str[1:])
-                if 1 <= num <= 12:
-                    return getattr(Key, f'f{num}')
-            except ValueError:
-                pass
+        Args:
+            steps: Step dicts, in order
         
-        return key_map.get(key_str.lower(), key_str if len(key_str) == 1 else None)
+        Returns:
+            List of PlannedStep
+        """
+        plan = []
+        for number, step in enumerate(steps, 1):
+            planned = PlannedStep(number, step, self.playback_speed * step.get('step_speed', 1.0))
+            action = step['action']
+            
+            if action == 'image_search':
+                planned.kind = 'image_search'
+            
+            elif action == 'type':
+                planned.kind = 'type'
+                planned.target = step.get('text', '')
+            
+            elif action == 'scroll':
+                planned.kind = 'scroll'
+                planned.target = step.get('scroll_amount', 0)
+                planned.settle = 0.05 / planned.speed
+            
+            elif action == 'drag':
+                planned.kind = 'drag'
+                planned.position = (step.get('start_x', 0), step.get('start_y', 0))
+                duration = max(0.0, step.get('duration', 0.5)) / planned.speed
+                # One point per sample period, ending exactly on the end point
+                samples = max(1, round(duration * max(1, step.get('drag_rate', DRAG_RATE))))
+                start = np.array(planned.position, dtype=np.float64)
+                end = np.array((step.get('end_x', 0), step.get('end_y', 0)), dtype=np.float64)
+                fractions = np.linspace(0.0, 1.0, samples + 1)[1:, None]
+                path = np.rint(start + (end - start) * fractions).astype(int)
+                planned.target = [tuple(point) for point in path.tolist()]
+                planned.gap = duration / samples
+            
+            else:
+                # Regular click/hold step
+                key = step.get('key', '').lower()
+                amount = step.get('amount', 1)
+                if 'click' in key:  # Mouse click
+                    planned.kind = 'mouse_click' if action == 'click' else 'mouse_hold'
+                    planned.target = Button.left if 'left' in key else Button.right
+                elif key == 'mouse_move':
+                    planned.kind = 'mouse_move'
+                else:  # Keyboard key
+                    planned.target = self._parse_key(key)
+                    if planned.target:
+                        planned.kind = 'key_click' if action == 'click' else 'key_hold'
+                
+                if action == 'click':
+                    planned.count = int(amount)
+                else:
+                    planned.duration = amount / planned.speed
+            
+            plan.append(planned)
+        return plan
+    
+    def _run_image_search_step(self, planned, session):
+        """Wait for a step's image (with timeout) and optionally click it"""
+        step = planned.step
+        image_path = step.get('image_path', '')
+        confidence = step.get('confidence', 0.8)
+        search_timeout = step.get('search_timeout', 30)  # Default 30 seconds
+        changes = session['changes']
+        
+        # Wait for image to be found (with timeout), polling fast at first and
+        # backing off while the screen stays static
+        poll = PollPolicy(step.get('poll_min', 0.1), step.get('poll_max', 1.0))
+        likely_scale = None
+        if step.get('scale_search'):
+            # Steps from before scale search was added were most likely recorded at 100%
+            likely_scale = self.display_scale / step.get('recorded_scale', 1.0)
+        start_time = time.time()
+        result = None
+        
+        while result is None and not self.stop_playback:
+            elapsed = time.time() - start_time
+            
+            # Check timeout (0 = no timeout, wait forever)
+            if search_timeout > 0 and elapsed >= search_timeout:
+                # Decide whether to retry or move on based on step setting
+                if step.get('on_timeout', 'move_on') == 'retry':
+                    # restart the timer and try again
+                    start_time = time.time()
+                    poll.reset()
+                    # small pause to avoid tight loop
+                    self._stop_event.wait(0.2)
+                    continue
+                else:
+                    self._post_status(f"⏱️ Timeout: Image not found after {search_timeout}s")
+                    break
+            
+            # Update status with search progress
+            if search_timeout > 0:
+                self._post_status(f"🔍 Searching for image... ({elapsed:.1f}s / {search_timeout}s)")
+            else:
+                self._post_status(f"🔍 Searching for image... ({elapsed:.1f}s)")
+            
+            result = self._search_for_image(image_path, confidence, step.get('search_region'),
+                                            step.get('match_mode', 'exact'), step.get('color_mode', 'color'),
+                                            session['frames'], changes, session['hints'],
+                                            (planned.number, image_path, confidence), likely_scale)
+            
+            if result is None:
+                # Wait before retrying (snap back to fast polling if the area changed)
+                interval = poll.next_interval(changes.last_changed)
+                if search_timeout > 0:
+                    interval = min(interval, max(0.0, search_timeout - (time.time() - start_time)))
+                self._stop_event.wait(interval)
+        
+        # Searches take as long as they take; schedule what follows from here
+        clock = session['clock']
+        clock.restart()
+        
+        # If image not found after timeout, continue to next step
+        # (Status already updated in the search loop)
+        if result and step.get('click_image', False):
+            center_x, center_y, conf, scale = result
+            if scale != 1.0:
+                print(f"Image '{step.get('image_name', '')}' found at {scale:.0%} of its recorded size")
+            
+            # Determine click coordinates based on mode
+            if step.get('click_mode', 'offset') == 'absolute' and 'abs_x' in step:
+                click_x = step['abs_x']
+                click_y = step['abs_y']
+            else:
+                # Offset mode - click relative to image center
+                # Offsets were picked at the recorded size, so scale them with the match
+                click_x = center_x + round(step.get('offset_x', 0) * scale)
+                click_y = center_y + round(step.get('offset_y', 0) * scale)
+            
+            for _ in range(int(step.get('click_count', 1))):
+                self.mouse_controller.position = (click_x, click_y)
+                if not clock.wait(planned.settle):
+                    return False
+                self.mouse_controller.click(Button.left)
+        return True
+    
+    def _run_type_step(self, planned, session):
+        """Type a step's text; returns False if stopped part way"""
+        for char in planned.target:
+            if self.stop_playback:
+                return False
+            self.keyboard_controller.type(char)
+        return True
+    
+    def _run_scroll_step(self, planned, session):
+        """Scroll the mouse wheel, at the step's coordinates if it has them"""
+        if planned.position:
+            self.mouse_controller.position = planned.position
+            if not session['clock'].wait(planned.settle):
+                return False
+        self.mouse_controller.scroll(0, planned.target)
+        return True
+    
+    def _run_mouse_click_step(self, planned, session):
+        """Click a mouse button; returns False if stopped part way"""
+        clock = session['clock']
+        if planned.position:
+            self.mouse_controller.position = planned.position
+            if not clock.wait(planned.settle):
+                return False
+        for _ in range(planned.count):
+            self.mouse_controller.click(planned.target)
+            if not clock.wait(planned.gap):
+                return False
+        return True
+    
+    def _run_mouse_hold_step(self, planned, session):
+        """Hold a mouse button for the step's duration (released at once if stopped)"""
+        clock = session['clock']
+        if planned.position:
+            self.mouse_controller.position = planned.position
+            if not clock.wait(planned.settle):
+                return False
+        self.mouse_controller.press(planned.target)
+        try:
+            return clock.wait(planned.duration)
+        finally:
+            self.mouse_controller.release(planned.target)
+    
+    def _run_mouse_move_step(self, planned, session):
+        """Move the mouse without clicking"""
+        if planned.position:
+            self.mouse_controller.position = planned.position
+        return True
+    
+    def _run_key_click_step(self, planned, session):
+        """Tap a key; returns False if stopped part way"""
+        for _ in range(planned.count):
+            self.keyboard_controller.press(planned.target)
+            self.keyboard_controller.release(planned.target)
+            if not session['clock'].wait(planned.gap):
+                return False
+        return True
+    
+    def _run_key_hold_step(self, planned, session):
+        """Hold a key for the step's duration (released at once if stopped)"""
+        self.keyboard_controller.press(planned.target)
+        try:
+            return session['clock'].wait(planned.duration)
+        finally:
+            self.keyboard_controller.release(planned.target)
+    
+    def _run_drag_step(self, planned, session):
+        """Press at the start point, move along the precomputed path on schedule, release at the end"""
+        clock = session['clock']
+        self.mouse_controller.position = planned.position
+        if not clock.wait(planned.settle):
+            return False
+        self.mouse_controller.press(Button.left)
+        try:
+            for point in planned.target:
+                if not clock.wait(planned.gap):
+                    return False
+                self.mouse_controller.position = point
+        finally:
+            self.mouse_controller.release(Button.left)
+        return True
+    
+    def _parse_key(self, key_str):
+        """Parse key string to pynput key"""
+        return KEY_MAP.get(key_str.lower(), key_str if len(key_str) == 1 else None)
 
     def _is_point_inside_window(self, x, y):
         """Return True if screen coordinate (x,y) is inside the main app window."""
@@ -3456,9 +4045,11 @@ class SimpleMacroGUI:
                 else:
                     return
 
-                # Play hotkey toggles play/stop regardless of state
+                # Play hotkey toggles play/stop regardless of state. Stopping happens right
+                # here (not via the Tk loop) so playback stops within milliseconds
                 if key_name == self.play_hotkey.upper():
-                    self.root.after(0, self._toggle_play)
+                    if not self._request_stop():
+                        self.root.after(0, self._toggle_play)
 
                 # Record hotkey toggles record/stop regardless of state
                 elif key_name == self.record_hotkey.upper():
@@ -3472,7 +4063,10 @@ class SimpleMacroGUI:
     
     def run(self):
         """Run the GUI application"""
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self._item_detector_stop.set()
 
 
 def main():
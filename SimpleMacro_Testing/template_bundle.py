@@ -0,0 +1,293 @@
+"""
+Precompiled template bundle for fast macro startup
+Run with: python template_bundle.py build <template folder>
+
+A bundle is two files in the template folder: templates.bundle holds the
+decoded BGR pixels of every template back to back, and templates.bundle.json
+indexes them (source file, mtime, size, offset, shape). Loading maps the
+bundle into memory and hands out read-only views, so nothing is decoded.
+
+Each build gets a random bundle id, written both in the bundle's header and
+in the index, so an index is only ever used with the bundle it was built for.
+"""
+
+import os
+import sys
+import json
+import mmap
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+
+BUNDLE_NAME = "templates.bundle"
+INDEX_NAME = "templates.bundle.json"
+BUNDLE_VERSION = 2
+# Each template starts on an aligned offset inside the bundle
+ALIGNMENT = 64
+# Bundle header: magic followed by the bundle id, padded to ALIGNMENT bytes
+BUNDLE_MAGIC = b"TPLBNDL2"
+BUNDLE_ID_BYTES = 16
+# Same file types RobloxMacro loads, in the same order (later files win on name clashes)
+TEMPLATE_PATTERNS = ("*.png", "*.jpg")
+
+
+def template_files(folder) -> Dict[str, Path]:
+    """Map template name -> source image, resolving name clashes like RobloxMacro does"""
+    folder = Path(folder)
+    files = {}
+    for pattern in TEMPLATE_PATTERNS:
+        for path in sorted(folder.glob(pattern)):
+            files[path.stem] = path
+    return files
+
+
+def _up_to_date(entry: Optional[dict], path: Path) -> bool:
+    """Check whether a bundle index entry still matches its source file"""
+    return (entry is not None and entry["file"] == path.name and
+            (entry["mtime_ns"], entry["size"]) == _stamp(path))
+
+
+def _stamp(path: Path) -> Tuple[int, int]:
+    """Return the (mtime_ns, size) pair used to detect changed sources"""
+    st = path.stat()
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _decode(path: Path) -> Optional[np.ndarray]:
+    """Decode one template the same way the template cache does (BGR, 8 bit)"""
+    return cv2.imread(str(path))
+
+
+def decode_parallel(paths: List[Path]) -> Dict[Path, Optional[np.ndarray]]:
+    """
+    Decode several images on a thread pool (cv2.imread releases the GIL)
+
+    Args:
+        paths: Image files to decode
+
+    Returns:
+        Mapping of path -> BGR image, or None where decoding failed
+    """
+    if not paths:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 4)) as pool:
+        return dict(zip(paths, pool.map(_decode, paths)))
+
+
+def _read_index(folder: Path) -> Optional[dict]:
+    """Read a bundle index, or None if it's missing, unreadable or from another version"""
+    try:
+        with open(folder / INDEX_NAME, "r") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.get("version") != BUNDLE_VERSION:
+        return None
+    return index
+
+
+def _open_bundle(folder: Path, index: Optional[dict]) -> Optional[mmap.mmap]:
+    """
+    Map the bundle's pixel data read-only
+
+    Args:
+        folder: Template folder
+        index: The folder's bundle index
+
+    Returns:
+        The mapping, or None if there is no bundle or it isn't the one the index was built for
+    """
+    if index is None:
+        return None
+    try:
+        with open(folder / BUNDLE_NAME, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # ValueError: an empty file can't be mapped
+        return None
+    header = data[:len(BUNDLE_MAGIC) + BUNDLE_ID_BYTES]
+    if (len(data) != index.get("bundle_size") or header[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC or
+            header[len(BUNDLE_MAGIC):].hex() != index.get("bundle_id")):
+        data.close()
+        return None
+    return data
+
+
+def _view(data: mmap.mmap, entry: dict) -> np.ndarray:
+    """Read-only array over one template's pixels in the mapped bundle"""
+    shape = tuple(entry["shape"])
+    count = int(np.prod(shape))
+    return np.frombuffer(data, dtype=np.uint8, count=count, offset=entry["offset"]).reshape(shape)
+
+
+def build_bundle(folder, verbose: bool = True) -> dict:
+    """
+    Build or update the bundle for a template folder
+
+    Templates whose source file is unchanged (same mtime and size) are copied
+    from the existing bundle; only new and changed files are decoded.
+
+    Args:
+        folder: Template folder
+        verbose: Print what was rebuilt
+
+    Returns:
+        Counters: 'reused', 'decoded', 'failed' and 'bytes'
+    """
+    folder = Path(folder)
+    old_index = _read_index(folder)
+    old_data = _open_bundle(folder, old_index)
+
+    # Decide per template whether the old bundle still has it
+    sources = template_files(folder)
+    reuse = {}
+    if old_data is not None:
+        for name, path in sources.items():
+            if _up_to_date(old_index["templates"].get(name), path):
+                reuse[name] = old_index["templates"][name]
+    decoded = decode_parallel([path for name, path in sources.items() if name not in reuse])
+
+    bundle_id = os.urandom(BUNDLE_ID_BYTES)
+    index = {"version": BUNDLE_VERSION, "bundle_id": bundle_id.hex(), "templates": {}}
+    stats = {"reused": 0, "decoded": 0, "failed": 0, "bytes": 0}
+    temp_bundle = folder / (BUNDLE_NAME + ".tmp")
+    try:
+        with open(temp_bundle, "wb") as out:
+            header = BUNDLE_MAGIC + bundle_id
+            out.write(header + b"\0" * (-len(header) % ALIGNMENT))
+            offset = out.tell()
+            for name, path in sources.items():
+                if name in reuse:
+                    # Copy the bytes rather than viewing them, so the old mapping can be closed
+                    old = reuse[name]
+                    shape = tuple(old["shape"])
+                    pixels = np.frombuffer(old_data[old["offset"]:old["offset"] + int(np.prod(shape))],
+                                           dtype=np.uint8).reshape(shape)
+                    stats["reused"] += 1
+                else:
+                    pixels = decoded.get(path)
+                    if pixels is None:
+                        print(f"Failed to decode {path.name}, leaving it out of the bundle")
+                        stats["failed"] += 1
+                        continue
+                    stats["decoded"] += 1
+                    if verbose:
+                        print(f"Decoded {path.name}")
+                padding = -offset % ALIGNMENT
+                out.write(b"\0" * padding)
+                offset += padding
+                out.write(np.ascontiguousarray(pixels).tobytes())
+                mtime_ns, size = _stamp(path)
+                index["templates"][name] = {
+                    "file": path.name,
+                    "mtime_ns": mtime_ns,
+                    "size": size,
+                    "offset": offset,
+                    "shape": list(pixels.shape)
+                }
+                offset += pixels.nbytes
+            stats["bytes"] = offset
+            index["bundle_size"] = offset
+    finally:
+        if old_data is not None:
+            old_data.close()
+
+    # Swap in the new files. A crash between the two replaces leaves the old index
+    # next to the new bundle; its bundle id doesn't match, so the index is ignored
+    # and every template is decoded until the next build
+    os.replace(temp_bundle, folder / BUNDLE_NAME)
+    temp_index = folder / (INDEX_NAME + ".tmp")
+    with open(temp_index, "w") as f:
+        json.dump(index, f, indent=1)
+    os.replace(temp_index, folder / INDEX_NAME)
+    return stats
+
+
+def load_templates(folder) -> Tuple[Dict[str, np.ndarray], dict]:
+    """
+    Load every template in a folder, from the bundle where possible
+
+    Templates that are up to date in the bundle are memory-mapped views (no
+    decoding). Templates missing from it or changed since it was built are
+    decoded in parallel instead.
+
+    Args:
+        folder: Template folder
+
+    Returns:
+        Tuple of (mapping of template name -> read-only BGR image, counters with
+        'mapped', 'decoded' and 'failed')
+    """
+    folder = Path(folder)
+    index = _read_index(folder)
+    data = _open_bundle(folder, index)
+
+    templates = {}
+    stats = {"mapped": 0, "decoded": 0, "failed": 0}
+    stale = []
+    for name, path in template_files(folder).items():
+        entry = index["templates"].get(name) if data is not None else None
+        if _up_to_date(entry, path):
+            templates[name] = _view(data, entry)
+            stats["mapped"] += 1
+        else:
+            stale.append(path)
+
+    for path, image in decode_parallel(stale).items():
+        if image is None:
+            print(f"Failed to load template: {path.name}")
+            stats["failed"] += 1
+            continue
+        image.setflags(write=False)
+        templates[path.stem] = image
+        stats["decoded"] += 1
+    return templates, stats
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Build or inspect a template bundle")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Build or update the bundle (only changed templates are decoded)")
+    build.add_argument("folder", help="Template folder")
+    build.add_argument("--quiet", action="store_true", help="Only print the summary")
+    info = sub.add_parser("info", help="Show which templates the bundle covers")
+    info.add_argument("folder", help="Template folder")
+    args = parser.parse_args()
+
+    folder = Path(args.folder)
+    if not folder.is_dir():
+        parser.error(f"not a folder: {folder}")
+
+    if args.command == "build":
+        stats = build_bundle(folder, verbose=not args.quiet)
+        print(f"Bundle: {stats['reused']} reused, {stats['decoded']} decoded, {stats['failed']} failed, "
+              f"{stats['bytes'] / 2**20:.1f} MB")
+        return 1 if stats["failed"] else 0
+
+    index = _read_index(folder)
+    if index is None:
+        print("No bundle (run: python template_bundle.py build <folder>)")
+        return 1
+    data = _open_bundle(folder, index)
+    if data is None:
+        print("The index doesn't match the bundle file (run: python template_bundle.py build <folder>)")
+        return 1
+    data.close()
+    for name, path in template_files(folder).items():
+        entry = index["templates"].get(name)
+        if entry is None or entry["file"] != path.name:
+            state = "missing"
+        elif not _up_to_date(entry, path):
+            state = "stale"
+        else:
+            state = "ok"
+        print(f"{state:8s} {path.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Shared test setup: the modules live flat in the parent folder, and no test
+needs a screen or input devices (synthetic numpy images only)
+"""
+
+import os
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def rng():
+    """Repeatable random generator"""
+    return np.random.default_rng(0)
+
+
+@pytest.fixture
+def screen(rng):
+    """A screen-like BGR image: smooth blobs, so templates cut from it have one clear match"""
+    import cv2
+    noise = rng.integers(0, 256, (60, 80, 3), dtype=np.uint8)
+    return cv2.resize(noise, (640, 480), interpolation=cv2.INTER_LINEAR)
+
+
+class FakeCapture:
+    """Stands in for ScreenCapture: a fixed 'screen' (by default every pixel encodes its position)"""
+
+    def __init__(self, screen=None, width=320, height=200):
+        if screen is None:
+            ys, xs = np.mgrid[0:height, 0:width]
+            screen = np.dstack([xs % 256, ys % 256, (xs // 256) * 16 + ys // 256]).astype(np.uint8)
+        self.screen = screen
+        self.areas = []
+        self.closed_threads = []
+        self._lock = threading.Lock()
+
+    def monitor(self):
+        height, width = self.screen.shape[:2]
+        return {"left": 0, "top": 0, "width": width, "height": height}
+
+    def grab(self, region=None, dst=None, color_mode="color"):
+        area = region or self.monitor()
+        with self._lock:
+            self.areas.append(dict(area))
+        crop = self.screen[area["top"]:area["top"] + area["height"], area["left"]:area["left"] + area["width"]]
+        if dst is not None and dst.shape == crop.shape:
+            dst[...] = crop
+            return dst
+        return crop.copy()
+
+    def close_thread(self):
+        with self._lock:
+            self.closed_threads.append(threading.current_thread().name)
+
+
+@pytest.fixture
+def fake_capture():
+    """The FakeCapture class, for tests that build their own"""
+    return FakeCapture
@@ -0,0 +1,61 @@
+"""Tests for ChangeDetector in image_utils.py"""
+
+import numpy as np
+
+from image_utils import ChangeDetector
+
+
+def test_unchanged_area_is_skipped_after_a_miss(screen):
+    changes = ChangeDetector()
+    area = screen[100:200, 100:260]
+    assert changes.should_match("step", area)
+    changes.record_result("step", False)
+    assert not changes.should_match("step", area.copy())
+    assert (changes.checked, changes.skipped) == (2, 1)
+    assert not changes.last_changed
+
+
+def test_changed_area_is_matched_again(screen):
+    changes = ChangeDetector(cell_size=16, threshold=2)
+    area = screen[100:200, 100:260].copy()
+    changes.should_match("step", area)
+    changes.record_result("step", False)
+    # One cell-sized patch changes by much more than the threshold
+    area[32:48, 64:80] = 255 - area[32:48, 64:80]
+    assert changes.should_match("step", area)
+    assert changes.last_changed
+
+
+def test_noise_below_threshold_counts_as_unchanged(screen, rng):
+    changes = ChangeDetector(cell_size=16, threshold=2)
+    area = screen[100:196, 100:260]
+    changes.should_match("step", area)
+    changes.record_result("step", False)
+    jitter = rng.integers(-1, 2, area.shape)
+    assert not changes.should_match("step", np.clip(area.astype(int) + jitter, 0, 255).astype(np.uint8))
+
+
+def test_found_result_and_reset_force_matching(screen):
+    changes = ChangeDetector()
+    area = screen[:64, :64]
+    changes.should_match("step", area)
+    changes.record_result("step", True)
+    # A hit is never skipped next time: the target may have moved away
+    assert changes.should_match("step", area)
+    changes.record_result("step", False)
+    assert not changes.should_match("step", area)
+
+    changes.reset("step")
+    assert changes.should_match("step", area)
+    changes.record_result("step", False)
+    changes.reset()
+    assert changes.should_match("step", area)
+
+
+def test_keys_and_area_sizes_are_independent(screen):
+    changes = ChangeDetector()
+    changes.should_match("a", screen[:64, :64])
+    changes.record_result("a", False)
+    assert changes.should_match("b", screen[:64, :64])
+    # A resized search area can't be compared with the old signature
+    assert changes.should_match("a", screen[:64, :128])
@@ -0,0 +1,68 @@
+"""Tests for find_peaks, score-ordered NMS and ImageDetector.find_all_images"""
+
+import numpy as np
+import pytest
+
+from image_utils import ImageDetector, find_peaks
+
+POSITIONS = [(100, 50), (400, 300), (250, 200)]
+
+
+@pytest.fixture
+def detector(screen, rng, fake_capture):
+    """Detector over a screen with three copies of a patch, each a bit noisier than the last"""
+    patch = rng.integers(0, 256, (24, 24, 3), dtype=np.uint8)
+    screen = screen.copy()
+    for i, (x, y) in enumerate(POSITIONS):
+        noise = rng.integers(-20 * i, 20 * i + 1, patch.shape)
+        screen[y:y + 24, x:x + 24] = np.clip(patch.astype(int) + noise, 0, 255)
+    detector = ImageDetector(confidence_threshold=0.6)
+    detector.screen = fake_capture(screen)
+    detector.patch = patch
+    return detector
+
+
+def test_find_peaks_one_per_blob_sorted_by_score():
+    scores = np.zeros((100, 100), np.float32)
+    ys, xs = np.mgrid[0:100, 0:100]
+    for (x, y), height in [((20, 30), 0.9), ((70, 60), 0.95), ((50, 10), 0.85)]:
+        scores = np.maximum(scores, height * np.exp(-((xs - x) ** 2 + (ys - y) ** 2) / 20.0)).astype(np.float32)
+
+    locations, peak_scores = find_peaks(scores, 0.5, (9, 9))
+    assert [tuple(loc) for loc in locations] == [(70, 60), (20, 30), (50, 10)]
+    assert list(peak_scores) == sorted(peak_scores, reverse=True)
+
+    locations, _ = find_peaks(scores, 0.5, (9, 9), max_peaks=1)
+    assert [tuple(loc) for loc in locations] == [(70, 60)]
+    assert len(find_peaks(scores, 0.99, (9, 9))[0]) == 0
+
+
+def test_nms_keeps_the_best_of_overlapping_boxes():
+    detector = ImageDetector()
+    boxes = np.array([[0, 0, 10, 10], [2, 2, 10, 10], [50, 50, 10, 10]])
+    scores = np.array([0.7, 0.9, 0.8])
+    # The later, higher scoring box wins its group; results come best first
+    assert detector._non_max_suppression(boxes, 0.3, scores) == [1, 2]
+    assert detector._non_max_suppression(boxes, 0.3, scores, top_k=1) == [1]
+    # Without scores, boxes are visited in order
+    assert detector._non_max_suppression(boxes, 0.3) == [0, 2]
+
+
+def test_find_all_images_returns_boxes_best_first(detector):
+    boxes = detector.find_all_images(detector.patch)
+    assert boxes == [(x, y, 24, 24) for x, y in POSITIONS]
+    assert all(isinstance(v, int) for box in boxes for v in box)
+
+
+def test_find_all_images_with_scores_and_top_k(detector):
+    matches = detector.find_all_images(detector.patch, with_scores=True)
+    assert [box for box, _ in matches] == [(x, y, 24, 24) for x, y in POSITIONS]
+    scores = [score for _, score in matches]
+    assert scores == sorted(scores, reverse=True) and scores[0] > 0.99
+
+    assert detector.find_all_images(detector.patch, top_k=2) == [(x, y, 24, 24) for x, y in POSITIONS[:2]]
+
+
+def test_find_all_images_in_region_uses_screen_coordinates(detector):
+    region = {"left": 380, "top": 280, "width": 80, "height": 60}
+    assert detector.find_all_images(detector.patch, region=region) == [(400, 300, 24, 24)]
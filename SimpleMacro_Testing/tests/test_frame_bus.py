@@ -0,0 +1,187 @@
+"""Tests for the FrameBus and Frame in image_utils.py (with a fake capture service)"""
+
+import time
+
+import numpy as np
+import pytest
+
+from image_utils import Frame, FrameBus
+
+
+@pytest.fixture
+def capture(fake_capture):
+    return fake_capture()
+
+
+@pytest.fixture
+def bus(capture):
+    return FrameBus(capture=capture, tick=0.0)
+
+
+REGION = {"left": 40, "top": 30, "width": 50, "height": 20}
+
+
+def test_frame_covers():
+    image = np.zeros((20, 50, 3), np.uint8)
+    cropped = Frame(image, 0.0, (40, 30), 1)
+    assert cropped.covers(REGION)
+    assert not cropped.covers({"left": 39, "top": 30, "width": 50, "height": 20})
+    # A search-area capture is not a whole-monitor frame
+    assert not cropped.covers(None)
+    assert Frame(image, 0.0, (0, 0), 1, full_monitor=True).covers(None)
+
+
+def test_region_capture_is_not_served_as_full_screen(bus, capture):
+    with bus.subscribe(max_age=5.0, region=REGION) as frames:
+        frame = frames.get()
+        assert frame.origin == (40, 30) and frame.image.shape == (20, 50, 3)
+        assert capture.areas[-1] == REGION
+
+        # Same subscription, now without a search area: must get a whole-monitor frame
+        frames.region = None
+        frame = frames.get()
+        assert frame.full_monitor
+        assert frame.origin == (0, 0) and frame.image.shape == capture.screen.shape
+        assert np.array_equal(frame.image, capture.screen)
+
+
+def test_capture_covers_bounding_box_of_subscribers(bus, capture):
+    other = {"left": 100, "top": 10, "width": 20, "height": 20}
+    with bus.subscribe(max_age=5.0, region=REGION) as first, bus.subscribe(max_age=5.0, region=other) as second:
+        frame = first.get()
+        assert second.get() is frame
+        assert frame.origin == (40, 10) and frame.image.shape == (40, 80, 3)
+        assert not frame.image.flags.writeable
+
+
+def test_bounding_region():
+    from image_utils import bounding_region
+    other = {"left": 100, "top": 10, "width": 20, "height": 20}
+    assert bounding_region([REGION, other]) == {"left": 40, "top": 10, "width": 80, "height": 40}
+    assert bounding_region([REGION]) == REGION
+    # Any whole-monitor consumer (or none at all) means a whole-monitor capture
+    assert bounding_region([REGION, None]) is None
+    assert bounding_region([]) is None
+
+
+def address(array):
+    return array.__array_interface__["data"][0]
+
+
+def test_buffer_pool_reuses_memory_only_when_nothing_references_it():
+    from image_utils import BufferPool
+    pool = BufferPool(max_buffers=2)
+    first = pool.acquire((4, 4, 3))
+    crop = first[1:3, 1:3]
+    first_address = address(first)
+    del first
+    # A crop still holds the memory, so a new buffer is allocated
+    second = pool.acquire((4, 4, 3))
+    assert address(second) != first_address and pool.allocations == 2
+    del crop
+    third = pool.acquire((4, 4, 3))
+    assert address(third) == first_address and pool.allocations == 2
+    assert third.flags.writeable and third.shape == (4, 4, 3)
+    # Other sizes never get mismatched memory
+    assert pool.acquire((2, 2, 3)).shape == (2, 2, 3)
+    assert pool.allocations == 3
+
+
+def test_buffer_pool_keeps_at_most_max_buffers():
+    from image_utils import BufferPool
+    pool = BufferPool(max_buffers=2)
+    buffers = [pool.acquire((8,)) for _ in range(4)]
+    del buffers
+    assert len(pool._free) == 2
+
+
+class CountingCapture:
+    """Wraps a fake capture so each grab fills the frame with the grab number"""
+
+    def __init__(self, capture):
+        self.capture = capture
+
+    def __getattr__(self, name):
+        return getattr(self.capture, name)
+
+    def grab(self, region=None, dst=None, color_mode="color"):
+        image = self.capture.grab(region, dst, color_mode)
+        image[...] = len(self.capture.areas)
+        return image
+
+
+def drive(bus, frames, captures):
+    """Let each frame go stale, so every get asks for a new capture"""
+    while bus.captures < captures:
+        assert frames.get() is not None
+        time.sleep(0.03)
+
+
+def test_held_frames_keep_their_pixels(capture):
+    bus = FrameBus(capture=CountingCapture(capture), tick=0.0, buffer_size=3)
+    with bus.subscribe(max_age=0.02) as frames:
+        held = frames.get()
+        crop = held.image[5:10, 5:10]
+        drive(bus, frames, 12)
+        # Long out of the ring, but still referenced: never overwritten
+        assert (held.image == held.seq).all() and (crop == held.seq).all()
+        ring = list(bus._frames)
+        assert all((frame.image == frame.seq).all() for frame in ring)
+
+
+def test_search_area_crop_outlives_its_frame(capture):
+    from image_utils import crop_region
+    bus = FrameBus(capture=CountingCapture(capture), tick=0.0, buffer_size=3)
+    with bus.subscribe(max_age=0.02) as frames:
+        frame = frames.get()
+        seq = frame.seq
+        crop, origin = crop_region(frame.converted("color"), frame.origin, REGION)
+        del frame
+        drive(bus, frames, 12)
+        # Only the crop is left (as in an image search step), and it still reads the same capture
+        assert origin == (40, 30) and (crop == seq).all()
+
+
+def test_unheld_frame_buffers_are_recycled(capture):
+    bus = FrameBus(capture=CountingCapture(capture), tick=0.0, buffer_size=3)
+    with bus.subscribe(max_age=0.02) as frames:
+        drive(bus, frames, 12)
+        # The ring, the frame being captured and the one a get just returned; not one per capture
+        assert bus._buffers.allocations <= 3 + 2
+
+
+def test_capture_thread_closes_its_grabber_on_exit(bus, capture):
+    with bus.subscribe(max_age=5.0) as frames:
+        assert frames.get() is not None
+        thread = bus._thread
+    thread.join(1.0)
+    assert not thread.is_alive()
+    assert capture.closed_threads == ["FrameBus"]
+
+
+def test_screen_capture_close_thread_only_closes_the_callers_grabber():
+    import threading
+    from image_utils import ScreenCapture
+
+    class Grabber:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    capture = ScreenCapture()
+    mine = capture._local.sct = Grabber()
+    other = []
+
+    def worker():
+        other.append(Grabber())
+        capture._local.sct = other[0]
+
+    worker_thread = threading.Thread(target=worker)
+    worker_thread.start()
+    worker_thread.join()
+    capture.close_thread()
+    assert mine.closed and capture._local.sct is None
+    assert not other[0].closed
+    # Closing twice is harmless
+    capture.close_thread()
@@ -0,0 +1,92 @@
+"""Tests for the match_template modes in image_utils.py on a synthetic screen"""
+
+import numpy as np
+import pytest
+
+from image_utils import match_template
+
+# (x, y, width, height) of templates cut from the screen; sizes cover no, 2x and 4x downscaling
+CUTS = [(37, 51, 20, 20), (300, 200, 32, 28), (512, 391, 64, 56), (5, 400, 100, 48)]
+
+
+@pytest.mark.parametrize("cut", CUTS)
+def test_pyramid_finds_the_exact_match(screen, cut):
+    x, y, w, h = cut
+    template = screen[y:y + h, x:x + w].copy()
+    exact = match_template(screen, template, 0.8)
+    pyramid = match_template(screen, template, 0.8, mode="pyramid")
+    assert exact[1] == (x, y) and exact[0] > 0.99
+    assert pyramid[1] == exact[1]
+    # Pyramid scores are full-resolution scores, comparable with the same threshold
+    assert pyramid[0] == pytest.approx(exact[0], abs=1e-4)
+
+
+def test_pyramid_agrees_in_gray_and_with_noise(screen, rng):
+    import cv2
+    gray = cv2.cvtColor(screen, cv2.COLOR_BGR2GRAY)
+    noisy = np.clip(gray.astype(int) + rng.integers(-15, 16, gray.shape), 0, 255).astype(np.uint8)
+    template = gray[120:176, 200:264].copy()
+    exact = match_template(noisy, template, 0.7)
+    pyramid = match_template(noisy, template, 0.7, mode="pyramid")
+    assert exact[1] == (200, 120)
+    assert pyramid == (pytest.approx(exact[0], abs=1e-4), exact[1])
+
+
+def test_pyramid_with_mask(screen):
+    template = screen[100:164, 100:164].copy()
+    mask = np.zeros((64, 64), np.uint8)
+    mask[8:56, 8:56] = 255
+    # Garbage under the transparent border must not matter
+    template[mask == 0] = 0
+    exact = match_template(screen, template, 0.8, mask=mask)
+    pyramid = match_template(screen, template, 0.8, mode="pyramid", mask=mask)
+    assert exact[1] == (100, 100)
+    assert pyramid[1] == exact[1] and pyramid[0] == pytest.approx(exact[0], abs=1e-4)
+
+
+def test_pyramid_below_threshold_reports_full_resolution_score(screen, rng):
+    template = rng.integers(0, 256, (48, 48, 3), dtype=np.uint8)
+    # Even with PYRAMID_SCORE_SLACK, no coarse score comes close enough to this threshold to be refined
+    score, (x, y) = match_template(screen, template, 1.3, mode="pyramid")
+    assert 0 <= x <= screen.shape[1] - 48 and 0 <= y <= screen.shape[0] - 48
+    # The best guess is scored like an exact match at that location, not with the coarse score
+    at_location = match_template(screen[y:y + 48, x:x + 48], template, 0.9)[0]
+    assert score == pytest.approx(at_location, abs=1e-5)
+    assert score <= match_template(screen, template, 0.9)[0] + 1e-5
+
+
+@pytest.fixture
+def many_tiles(monkeypatch):
+    """Split frames into more bands than this machine has cores"""
+    import image_utils
+    monkeypatch.setattr(image_utils, "TILE_WORKERS", 4)
+
+
+@pytest.mark.parametrize("cut", CUTS)
+def test_tiled_agrees_with_exact(screen, many_tiles, cut):
+    x, y, w, h = cut
+    template = screen[y:y + h, x:x + w].copy()
+    exact = match_template(screen, template, 0.8)
+    # A threshold nothing reaches makes every band run, so the merged maximum is the global one
+    score, loc = match_template(screen, template, 1.1, mode="tiled")
+    assert loc == exact[1] and score == pytest.approx(exact[0], abs=1e-5)
+
+
+def test_tiled_match_on_a_band_boundary(screen, many_tiles):
+    h = 20
+    result_h = screen.shape[0] - h + 1
+    # 8 bands: the first row of the third band, and the last row of the second
+    for y in (result_h * 2 // 8, result_h * 2 // 8 - 1):
+        template = screen[y:y + h, 250:290].copy()
+        assert match_template(screen, template, 1.1, mode="tiled")[1] == (250, y)
+        # With early exit any position above the threshold may win (neighbors of a
+        # match on a smooth screen score high too), but its score is the real one
+        score, (x, found_y) = match_template(screen, template, 0.8, mode="tiled")
+        assert score >= 0.8
+        assert score == pytest.approx(match_template(screen[found_y:found_y + h, x:x + 40], template, 0.8)[0], abs=1e-5)
+
+
+def test_tiled_falls_back_on_tiny_frames(screen, many_tiles):
+    template = screen[10:40, 10:40].copy()
+    strip = screen[10:40, :200]
+    assert match_template(strip, template, 0.8, mode="tiled") == match_template(strip, template, 0.8)
@@ -0,0 +1,82 @@
+"""Tests for wait_until and PlaybackClock in playback_clock.py"""
+
+import threading
+import time
+
+import pytest
+
+from playback_clock import MAX_CATCH_UP, PlaybackClock, wait_until
+
+
+def test_wait_until_never_returns_early():
+    for delay in (0.0, 0.001, 0.02):
+        deadline = time.perf_counter() + delay
+        assert wait_until(deadline)
+        assert time.perf_counter() >= deadline
+    # Deadlines in the past return at once
+    assert wait_until(time.perf_counter() - 1.0)
+
+
+def test_stop_event_ends_a_wait_early():
+    stop = threading.Event()
+    timer = threading.Timer(0.02, stop.set)
+    start = time.perf_counter()
+    timer.start()
+    assert not wait_until(start + 5.0, stop_event=stop)
+    assert time.perf_counter() - start < 1.0
+    # Already stopped: no wait at all, even inside the spin window
+    assert not wait_until(time.perf_counter() + 0.001, stop_event=stop)
+
+
+def test_deadlines_do_not_drift_with_work_between_waits():
+    clock = PlaybackClock()
+    start = clock.deadline
+    for _ in range(5):
+        time.sleep(0.005)  # Time an input call takes is absorbed by the next wait
+        assert clock.wait(0.02)
+    assert clock.deadline == pytest.approx(start + 0.1)
+    assert time.perf_counter() - start == pytest.approx(0.1, abs=0.03)
+
+
+def test_small_lateness_is_caught_up():
+    clock = PlaybackClock(max_catch_up=0.05)
+    clock.deadline = time.perf_counter() - 0.03
+    scheduled = clock.deadline + 0.01
+    # 20 ms behind: returns at once and keeps the schedule
+    assert clock.wait(0.01)
+    assert clock.deadline == scheduled
+    stats = clock.take_lateness()
+    assert stats["late_waits"] == 1 and stats["total"] == pytest.approx(0.02, abs=0.01)
+    assert clock.take_lateness() == {"total": 0.0, "worst": 0.0, "late_waits": 0}
+
+
+def test_stall_restarts_the_schedule():
+    clock = PlaybackClock()
+    clock.deadline = time.perf_counter() - 1.0
+    before = time.perf_counter()
+    assert clock.wait(0.01)
+    # Moved to now instead of rushing through a second of missed waits
+    assert clock.deadline >= before
+    assert clock.take_lateness()["worst"] > MAX_CATCH_UP
+
+
+def test_zero_delays_are_not_lateness():
+    clock = PlaybackClock()
+    for _ in range(100):
+        clock.restart()
+        # The microseconds between the restart and a zero delay aren't counted
+        assert clock.wait(0.0)
+    assert clock.take_lateness()["late_waits"] == 0
+
+
+def test_stopped_clock_returns_false():
+    stop = threading.Event()
+    clock = PlaybackClock(stop_event=stop)
+    assert clock.wait(0.001)
+    stop.set()
+    start = time.perf_counter()
+    assert not clock.wait(5.0)
+    assert time.perf_counter() - start < 0.1
+    # Late waits report the stop too
+    clock.deadline = time.perf_counter() - 1.0
+    assert not clock.wait(0.0)
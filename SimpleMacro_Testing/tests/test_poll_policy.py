@@ -0,0 +1,60 @@
+"""Tests for PollPolicy in image_utils.py (on a fake clock)"""
+
+import time
+
+import pytest
+
+from image_utils import PollPolicy
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable replacement for time.monotonic"""
+    class Clock:
+        now = 1000.0
+    monkeypatch.setattr(time, "monotonic", lambda: Clock.now)
+    return Clock
+
+
+def test_fast_period_then_exponential_backoff_to_max(clock):
+    policy = PollPolicy(min_interval=0.1, max_interval=1.0, backoff=2.0, fast_period=1.0)
+    assert [policy.next_interval() for _ in range(3)] == [0.1, 0.1, 0.1]
+    clock.now += 1.0
+    intervals = [policy.next_interval() for _ in range(5)]
+    assert intervals == pytest.approx([0.2, 0.4, 0.8, 1.0, 1.0])
+
+
+def test_change_snaps_back_to_min_interval(clock):
+    policy = PollPolicy(min_interval=0.1, max_interval=1.0, backoff=2.0, fast_period=1.0)
+    clock.now += 5.0
+    for _ in range(4):
+        policy.next_interval()
+    assert policy.interval == pytest.approx(1.0)
+    assert policy.next_interval(changed=True) == 0.1
+    # A change restarts the fast period too
+    clock.now += 0.5
+    assert policy.next_interval() == 0.1
+    clock.now += 0.5
+    assert policy.next_interval() == pytest.approx(0.2)
+
+
+def test_reset_starts_a_new_wait(clock):
+    policy = PollPolicy(min_interval=0.05, max_interval=0.5, backoff=1.5, fast_period=0.2)
+    clock.now += 1.0
+    for _ in range(10):
+        policy.next_interval()
+    assert policy.interval == pytest.approx(0.5)
+    policy.reset()
+    assert policy.next_interval() == 0.05
+
+
+@pytest.mark.parametrize("min_interval, max_interval", [(0.0, 1.0), (-0.1, 1.0), (0.5, 0.1)])
+def test_unusable_intervals_are_rejected(min_interval, max_interval):
+    # A zero interval would make the wait loop busy-spin
+    with pytest.raises(ValueError):
+        PollPolicy(min_interval=min_interval, max_interval=max_interval)
+
+
+def test_equal_min_and_max_poll_at_a_fixed_rate(clock):
+    policy = PollPolicy(min_interval=0.5, max_interval=0.5, fast_period=0.0)
+    assert [policy.next_interval() for _ in range(3)] == [0.5, 0.5, 0.5]
@@ -0,0 +1,39 @@
+"""Tests for SearchHints in image_utils.py"""
+
+from image_utils import SearchHints
+
+
+def test_window_around_last_hit():
+    hints = SearchHints(margin=10)
+    assert hints.window("step") is None
+    hints.record("step", (100, 50, 20, 30), from_hint=False)
+    assert hints.window("step") == {"left": 90, "top": 40, "width": 40, "height": 50}
+    # A miss keeps the last known location
+    hints.record("step", None, from_hint=False)
+    assert hints.window("step") == {"left": 90, "top": 40, "width": 40, "height": 50}
+    hints.record("step", (200, 60, 20, 30), from_hint=False)
+    assert hints.window("step")["left"] == 190
+
+
+def test_absent_target_does_not_count_as_hint_miss():
+    hints = SearchHints()
+    # The first find has no hint yet, so it isn't counted
+    hints.record("step", (100, 50, 20, 30), from_hint=False)
+    assert hints.hit_rate("step") is None
+
+    hints.record("step", (101, 50, 20, 30), from_hint=True)
+    hints.record("step", (300, 50, 20, 30), from_hint=False)
+    for _ in range(5):
+        hints.record("step", None, from_hint=False)
+    assert hints.hit_rate("step") == 0.5
+    assert hints.stats() == {"step": {"hits": 1, "misses": 1, "absent": 5, "hit_rate": 0.5}}
+
+
+def test_never_found_again_has_no_hit_rate():
+    hints = SearchHints()
+    hints.record("item", (0, 0, 8, 8), from_hint=False)
+    hints.record("item", None, from_hint=False)
+    assert hints.hit_rate("item") is None
+    assert hints.stats()["item"] == {"hits": 0, "misses": 0, "absent": 1, "hit_rate": None}
+    # Keys are independent
+    assert hints.hit_rate("other") is None and hints.window("other") is None
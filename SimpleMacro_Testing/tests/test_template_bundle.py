@@ -0,0 +1,90 @@
+"""Tests for template_bundle.py"""
+
+import os
+import shutil
+
+import cv2
+import numpy as np
+import pytest
+
+import template_bundle
+
+
+@pytest.fixture
+def folder(tmp_path, rng):
+    for i in range(5):
+        image = rng.integers(0, 256, (20 + i, 30, 3), dtype=np.uint8)
+        cv2.imwrite(str(tmp_path / f"t{i}.png"), image)
+    return tmp_path
+
+
+def _touch(path, image):
+    """Rewrite an image and make sure its mtime differs from before"""
+    stat = os.stat(path)
+    cv2.imwrite(str(path), image)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def _assert_matches_sources(folder, templates):
+    for name, path in template_bundle.template_files(folder).items():
+        assert np.array_equal(templates[name], cv2.imread(str(path))), name
+
+
+def test_round_trip_maps_every_template(folder):
+    stats = template_bundle.build_bundle(folder, verbose=False)
+    assert stats["decoded"] == 5 and stats["failed"] == 0
+
+    templates, load_stats = template_bundle.load_templates(folder)
+    assert load_stats == {"mapped": 5, "decoded": 0, "failed": 0}
+    _assert_matches_sources(folder, templates)
+    assert not templates["t0"].flags.writeable
+
+
+def test_without_bundle_everything_is_decoded(folder):
+    templates, stats = template_bundle.load_templates(folder)
+    assert stats == {"mapped": 0, "decoded": 5, "failed": 0}
+    _assert_matches_sources(folder, templates)
+
+
+def test_rebuild_only_decodes_changed_sources(folder):
+    template_bundle.build_bundle(folder, verbose=False)
+    _touch(folder / "t2.png", np.zeros((7, 9, 3), np.uint8))
+
+    templates, stats = template_bundle.load_templates(folder)
+    assert stats["mapped"] == 4 and stats["decoded"] == 1
+    assert templates["t2"].shape == (7, 9, 3)
+
+    stats = template_bundle.build_bundle(folder, verbose=False)
+    assert stats["reused"] == 4 and stats["decoded"] == 1
+    templates, stats = template_bundle.load_templates(folder)
+    assert stats["mapped"] == 5
+    _assert_matches_sources(folder, templates)
+
+
+def test_index_from_another_build_is_rejected(folder):
+    # Simulate a crash between swapping in a new bundle and its index: the
+    # old index must not be used with the new bundle's offsets
+    template_bundle.build_bundle(folder, verbose=False)
+    old_index = folder / "old_index.json"
+    shutil.copy(folder / template_bundle.INDEX_NAME, old_index)
+    _touch(folder / "t0.png", np.zeros((50, 50, 3), np.uint8))
+    template_bundle.build_bundle(folder, verbose=False)
+    shutil.copy(old_index, folder / template_bundle.INDEX_NAME)
+
+    templates, stats = template_bundle.load_templates(folder)
+    assert stats["mapped"] == 0 and stats["decoded"] == 5
+    _assert_matches_sources(folder, templates)
+
+    # The next build starts over and is consistent again
+    stats = template_bundle.build_bundle(folder, verbose=False)
+    assert stats["reused"] == 0 and stats["decoded"] == 5
+    templates, stats = template_bundle.load_templates(folder)
+    assert stats["mapped"] == 5
+    _assert_matches_sources(folder, templates)
+
+
+def test_name_clash_uses_the_later_pattern(folder):
+    cv2.imwrite(str(folder / "t1.jpg"), np.full((4, 4, 3), 200, np.uint8))
+    template_bundle.build_bundle(folder, verbose=False)
+    templates, _ = template_bundle.load_templates(folder)
+    assert templates["t1"].shape == (4, 4, 3)
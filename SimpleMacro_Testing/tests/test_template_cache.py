@@ -0,0 +1,81 @@
+"""Tests for TemplateCache in image_utils.py (templates written to a temp folder)"""
+
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from image_utils import TemplateCache
+
+
+def write(path, image, bump_ns=0):
+    """Write an image and optionally move its mtime forward (same-size rewrites within one tick)"""
+    assert cv2.imwrite(str(path), image)
+    if bump_ns:
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + bump_ns))
+
+
+@pytest.fixture
+def template(tmp_path, rng):
+    path = tmp_path / "button.png"
+    write(path, rng.integers(0, 256, (16, 24, 3), dtype=np.uint8))
+    return path
+
+
+def test_decodes_once_and_shares_read_only_images(template):
+    cache = TemplateCache()
+    first = cache.get(template)
+    assert first.shape == (16, 24, 3) and not first.flags.writeable
+    assert cache.get(str(template)) is first
+    assert cache.stats()["misses"] == 1 and cache.stats()["hits"] == 1
+
+
+def test_changed_file_is_decoded_again(template, rng):
+    cache = TemplateCache()
+    old = cache.get(template)
+    new_pixels = rng.integers(0, 256, (16, 24, 3), dtype=np.uint8)
+    write(template, new_pixels, bump_ns=10**9)
+    new = cache.get(template)
+    assert new is not old
+    assert np.array_equal(new, new_pixels)
+    assert cache.stats()["entries"] == 1
+
+
+def test_color_modes_are_cached_next_to_the_image(template):
+    cache = TemplateCache()
+    color = cache.get(template)
+    gray = cache.get(template, "gray")
+    assert gray.shape == (16, 24)
+    assert np.array_equal(cache.get(template, "red"), color[:, :, 2])
+    assert cache.get(template, "gray") is gray
+    # The BGR image isn't decoded again for new modes
+    assert cache.get(template) is color
+    with pytest.raises(ValueError):
+        cache.get(template, "sepia")
+
+
+def test_transparent_template_gets_a_mask(tmp_path):
+    image = np.full((10, 10, 4), 200, np.uint8)
+    image[:5, :, 3] = 0
+    write(tmp_path / "icon.png", image)
+    template, mask = TemplateCache().get_masked(tmp_path / "icon.png")
+    assert template.shape == (10, 10, 3)
+    assert (mask[:5] == 0).all() and (mask[5:] > 0).all()
+
+
+def test_missing_file_and_eviction(tmp_path, rng):
+    cache = TemplateCache(max_entries=2)
+    assert cache.get(tmp_path / "missing.png") is None
+    paths = []
+    for name in ("a", "b", "c"):
+        paths.append(tmp_path / f"{name}.png")
+        write(paths[-1], rng.integers(0, 256, (8, 8, 3), dtype=np.uint8))
+    first = cache.get(paths[0])
+    cache.get(paths[1])
+    cache.get(paths[0])  # Most recently used, so "b" is evicted next
+    cache.get(paths[2])
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["bytes"] == 2 * 8 * 8 * 3
+    assert cache.get(paths[0]) is first
@@ -11,11 +11,10 @@ from pathlib import Path
 import threading
 import sv_ttk
 from PIL import Image, ImageTk, ImageDraw
-import mss
 import cv2
-import numpy as np
 from pynput.keyboard import Controller as KeyboardController, Key, Listener as KeyboardListener
 from pynput.mouse import Controller as MouseController, Button, Listener as MouseListener
+from SimpleMacro_Testing.image_utils import template_cache, screen_capture
 
 
 class SimpleMacroGUI:
@@ -557,14 +556,11 @@ class SimpleMacroGUI:
         time.sleep(0.3)  # Wait for windows to hide
         
         # Take screenshot and store monitor offset for coordinate conversion
-        with mss.mss() as sct:
-            # Use monitor[1] for primary monitor (monitor[0] is the combined virtual screen)
-            # This gives us proper coordinate mapping
-            monitor = sct.monitors[1]  # Primary monitor
-            self.monitor_offset_x = monitor['left']
-            self.monitor_offset_y = monitor['top']
-            screenshot = sct.grab(monitor)
-            img = Image.frombytes('RGB', screenshot.size, screenshot.bgra, 'raw', 'BGRX')
+        # (the capture service uses the primary monitor, not the combined virtual screen)
+        monitor = screen_capture.monitor()
+        self.monitor_offset_x = monitor['left']
+        self.monitor_offset_y = monitor['top']
+        img = screen_capture.grab_pil()
         
         # Create fullscreen picker window
         picker = tk.Toplevel()
@@ -1712,14 +1708,10 @@ class SimpleMacroGUI:
         """Search for an image on screen and return center coordinates if found"""
         try:
             # Take screenshot
-            with mss.mss() as sct:
-                monitor = sct.monitors[1]  # Primary monitor
-                screenshot = sct.grab(monitor)
-                screen_img = np.array(screenshot)
-                screen_img = cv2.cvtColor(screen_img, cv2.COLOR_BGRA2BGR)
+            screen_img = screen_capture.grab()  # Primary monitor, persistent per-thread grabber
             
-            # Load template
-            template = cv2.imread(image_path)
+            # Load template (decoded once, then served from the shared cache)
+            template = template_cache.get(image_path)
             if template is None:
                 return None
             
@@ -2530,6 +2522,8 @@ class SimpleMacroGUI:
             messagebox.showerror("Error", f"Error executing macro:\n{str(e)}")
         
         finally:
+            # Image searches and loop screenshots opened a grabber on this thread
+            screen_capture.close_thread()
             self.playing = False
             self.stop_playback = False
     
@@ -2558,19 +2552,18 @@ class SimpleMacroGUI:
         if not getattr(self, 'discord_webhook_url', None) or not getattr(self, 'discord_webhook_enabled', False):
             return
 
+        # Take the screenshot on the calling (playback) thread so it reuses that thread's grabber
+        try:
+            img = screen_capture.grab_pil()
+        except Exception as e:
+            print(f"Discord webhook notify error: {e}")
+            return
+
         def _do_notify():
             try:
                 import json as _json
                 import requests as _requests
                 import io as _io
-                import mss as _mss
-
-                # Take screenshot
-                with _mss.mss() as sct:
-                    monitor = sct.monitors[1]
-                    sct_img = sct.grab(monitor)
-
-                img = Image.frombytes('RGB', sct_img.size, sct_img.bgra, 'raw', 'BGRX')
 
                 bio = _io.BytesIO()
                 img.save(bio, format='PNG')